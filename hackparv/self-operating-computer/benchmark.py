@@ -0,0 +1,281 @@
+"""
+Micro-benchmarks for the latency-critical pieces of `operate`.
+
+    python benchmark.py capture --xvfb
+    python benchmark.py typing --xvfb
+    python benchmark.py click --xvfb
+    python benchmark.py labels
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import time
+
+# Xvfb screen sizes used by `capture --xvfb`
+XVFB_RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    """Print throughput and p50/p99 latency for a list of durations in seconds."""
+    total = sum(samples)
+    print(
+        f"{label:<32} n={len(samples):<5} "
+        f"rate={len(samples) / total if total else float('inf'):8.1f}/s "
+        f"p50={percentile(samples, 50) * 1000:8.2f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.2f}ms"
+    )
+
+
+def time_calls(fn, iterations, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def start_xvfb(width, height, display=":99"):
+    if not shutil.which("Xvfb"):
+        raise SystemExit("Xvfb is not installed")
+    process = subprocess.Popen(
+        ["Xvfb", display, "-screen", "0", f"{width}x{height}x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(1)
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def bench_capture_backends(label, backends, iterations):
+    from operate.utils.capture import create_capture_backend
+
+    for name in backends:
+        try:
+            backend = create_capture_backend(name)
+        except Exception as e:
+            print(f"{label} {name:<10} unavailable: {e}")
+            continue
+        try:
+            report(f"{label} {name}", time_calls(backend.grab, iterations))
+        finally:
+            backend.close()
+
+
+def bench_capture(args):
+    backends = args.backend or ["xshm", "imagegrab"]
+    if not args.xvfb:
+        bench_capture_backends("capture", backends, args.iterations)
+        return
+
+    for label, (width, height) in XVFB_RESOLUTIONS.items():
+        xvfb = start_xvfb(width, height)
+        try:
+            bench_capture_backends(f"capture {label}", backends, args.iterations)
+        finally:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+def bench_typing(args):
+    # pyautogui connects to $DISPLAY on import, so start Xvfb first
+    xvfb = start_xvfb(1920, 1080) if args.xvfb else None
+
+    import pyautogui
+    from operate.utils.keyboard import PyAutoGUITyper, TypingEngine, XTestTyper
+
+    text = ("The quick brown fox jumps over the lazy dog. " * 8)[: args.length]
+    try:
+        typers = {"pyautogui": PyAutoGUITyper}
+        if xvfb or os.environ.get("DISPLAY"):
+            typers["xtest"] = XTestTyper
+
+        # the per-character baseline `OperatingSystem.write` used to run
+        def per_char():
+            for char in text:
+                pyautogui.write(char)
+
+        measured = [("per-char pyautogui.write", per_char)]
+        for name, typer_class in typers.items():
+            try:
+                typer = typer_class()
+            except Exception as e:
+                print(f"typing {name:<10} unavailable: {e}")
+                continue
+            engine = TypingEngine()
+            engine._typer = typer
+            measured.append(
+                (f"chunked {name}", lambda e=engine: e.type(text, 0, paste=False))
+            )
+        measured.append(("clipboard paste", lambda: TypingEngine().paste(text)))
+        for label, fn in measured:
+            samples = time_calls(fn, args.iterations, warmup=0)
+            chars_per_sec = len(text) * len(samples) / sum(samples)
+            print(f"{label:<32} {chars_per_sec:10.0f} chars/s")
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+def bench_click(args):
+    # pyautogui connects to $DISPLAY on import, so start Xvfb first
+    xvfb = start_xvfb(1920, 1080) if args.xvfb else None
+
+    from operate.utils.operating_system import CLICK_OPERATIONS, OperatingSystem
+
+    operating_system = OperatingSystem()
+    try:
+        for mode in args.mode or ["direct", "feedback"]:
+            for operation, kwargs in CLICK_OPERATIONS.items():
+                samples = time_calls(
+                    lambda: operating_system.click_at_percentage(
+                        0.5, 0.5, mode=mode, **kwargs
+                    ),
+                    args.iterations,
+                    warmup=1,
+                )
+                report(f"click {mode} {operation}", samples)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+def synthetic_boxes(count, width=1920, height=1080, seed=0):
+    """UI-element-sized xyxy boxes scattered over a screen, as YOLO would return."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(12, 160, (count, 2))
+    corners = rng.uniform(0, 1, (count, 2)) * ([width, height] - sizes)
+    return np.concatenate([corners, corners + sizes], axis=1)
+
+
+def bench_labels(args):
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    from operate.utils.label import (
+        BoxGrid,
+        LABEL_FONT_SIZE,
+        is_overlapping,
+        label_font,
+        suppress_overlapping,
+    )
+
+    # the per-box loop `add_labels` used to run
+    def pairwise(boxes):
+        drawn = []
+        keep = []
+        for box in boxes.tolist():
+            overlap = any(is_overlapping(box, other) for other in drawn)
+            if not overlap:
+                drawn.append(box)
+            keep.append(not overlap)
+        return np.array(keep)
+
+    for count in args.boxes or [100, 500, 2000]:
+        boxes = synthetic_boxes(count)
+        expected = pairwise(boxes)
+        measured = [
+            ("pairwise any()", pairwise),
+            ("overlap matrix", suppress_overlapping),
+            ("grid index", BoxGrid.suppress),
+        ]
+        for label, fn in measured:
+            if not np.array_equal(fn(boxes), expected):
+                raise SystemExit(f"{label} kept different boxes than the baseline")
+            samples = time_calls(lambda: fn(boxes), args.iterations)
+            report(f"filter {count} {label}", samples)
+
+        kept = boxes[expected].tolist()
+        image = Image.new("RGB", (1920, 1080))
+
+        def render(**font):
+            draw = ImageDraw.Draw(image)
+            for index, (x1, y1, x2, y2) in enumerate(kept):
+                draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
+                draw.text((x1, y1 - LABEL_FONT_SIZE), f"~{index}", fill="red", **font)
+
+        report(
+            f"render {len(kept)} font_size=",
+            time_calls(lambda: render(font_size=LABEL_FONT_SIZE), args.iterations),
+        )
+        report(
+            f"render {len(kept)} cached font",
+            time_calls(lambda: render(font=label_font()), args.iterations),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark operate internals.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture = subparsers.add_parser("capture", help="Screen capture backends")
+    capture.add_argument("-n", "--iterations", type=int, default=100)
+    capture.add_argument(
+        "--backend",
+        action="append",
+        help="Backend to measure, repeatable (default: xshm and imagegrab)",
+    )
+    capture.add_argument(
+        "--xvfb",
+        action="store_true",
+        help="Run against private Xvfb servers at 1080p and 4K",
+    )
+    capture.set_defaults(func=bench_capture)
+
+    typing = subparsers.add_parser(
+        "typing", help="Keystroke injection (types into the focused window)"
+    )
+    typing.add_argument("-n", "--iterations", type=int, default=3)
+    typing.add_argument("--length", type=int, default=200, help="Characters per run")
+    typing.add_argument(
+        "--xvfb", action="store_true", help="Type into a private Xvfb server"
+    )
+    typing.set_defaults(func=bench_typing)
+
+    click = subparsers.add_parser(
+        "click", help="Per-click latency for each click mode (clicks the screen center)"
+    )
+    click.add_argument("-n", "--iterations", type=int, default=20)
+    click.add_argument(
+        "--mode",
+        action="append",
+        choices=["direct", "feedback"],
+        help="Click mode to measure, repeatable (default: both)",
+    )
+    click.add_argument(
+        "--xvfb", action="store_true", help="Click inside a private Xvfb server"
+    )
+    click.set_defaults(func=bench_click)
+
+    labels = subparsers.add_parser(
+        "labels", help="SoM box filtering and label rendering on synthetic detections"
+    )
+    labels.add_argument("-n", "--iterations", type=int, default=20)
+    labels.add_argument(
+        "--boxes",
+        type=int,
+        action="append",
+        help="Detections per frame, repeatable (default: 100, 500 and 2000)",
+    )
+    labels.set_defaults(func=bench_labels)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
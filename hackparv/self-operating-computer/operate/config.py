@@ -1,13 +1,111 @@
+import importlib.util
 import os
 import sys
+import threading
 
-import google.generativeai as genai
 from dotenv import load_dotenv
-from ollama import Client
-from openai import OpenAI
-import anthropic
 from prompt_toolkit.shortcuts import input_dialog
 
+# Provider SDKs are imported by the `initialize_*` method that needs them, so
+# startup only pays for the selected model.
+
+
+class ClientRegistry:
+    """
+    Memoizes one SDK client per provider, base URL and key, all sharing one
+    keep-alive HTTP connection pool, and counts how often connections are
+    reused.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._http_client = None
+        self.stats = {
+            "created": 0,
+            "reused": 0,
+            "requests": 0,
+            "new_connections": 0,
+        }
+
+    @staticmethod
+    def http2_available():
+        return importlib.util.find_spec("h2") is not None
+
+    async def _on_request(self, request):
+        self.stats["requests"] += 1
+
+        async def trace(event, info):
+            if event == "connection.connect_tcp.complete":
+                self.stats["new_connections"] += 1
+
+        request.extensions["trace"] = trace
+
+    def http_options(self):
+        """
+        Keyword arguments for an `httpx.AsyncClient` with the shared pool limits
+        and the connection-reuse hooks.
+        """
+        import httpx
+
+        return {
+            "limits": httpx.Limits(
+                max_connections=20,
+                max_keepalive_connections=10,
+                keepalive_expiry=120,
+            ),
+            "event_hooks": {"request": [self._on_request]},
+        }
+
+    @property
+    def http_client(self):
+        """
+        The pool shared by the OpenAI-compatible and Anthropic clients.
+        """
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2_available(),
+                timeout=httpx.Timeout(600, connect=10),
+                **self.http_options(),
+            )
+        return self._http_client
+
+    def get(self, provider, key, factory):
+        """
+        Returns the client for `(provider, *key)`, creating it with `factory`
+        on first use.
+        """
+        cache_key = (provider,) + tuple(key)
+        with self._lock:
+            client = self._clients.get(cache_key)
+            if client is None:
+                client = self._clients[cache_key] = factory()
+                self.stats["created"] += 1
+            else:
+                self.stats["reused"] += 1
+        return client
+
+    async def aclose(self):
+        """
+        Closes the shared pool and forgets the clients, which are bound to the
+        event loop that used them.
+        """
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            self._clients.clear()
+        if http_client is not None:
+            await http_client.aclose()
+
+    def summary(self):
+        stats = dict(self.stats)
+        stats["reused_connections"] = max(
+            0, stats["requests"] - stats["new_connections"]
+        )
+        stats["http2"] = self.http2_available()
+        return stats
+
 
 class Config:
     """
@@ -29,6 +127,11 @@ class Config:
         return cls._instance
 
     def __init__(self):
+        # every module runs `Config()`, and modules imported lazily after
+        # `main()` must not reset the settings it made, like `verbose`
+        if getattr(self, "_initialized", False):
+            return
+        self._initialized = True
         load_dotenv()
         self.verbose = False
         self.openai_api_key = (
@@ -46,8 +149,85 @@ class Config:
         self.qwen_api_key = (
             None  # instance variables are backups in case saving to a `.env` fails
         )
+        # number of warm EasyOCR readers kept per language set
+        self.ocr_reader_pool_size = int(os.getenv("OCR_READER_POOL_SIZE", "1"))
+        # OCR results are cached per captured frame, bounded by frames and bytes
+        self.ocr_cache_max_frames = int(os.getenv("OCR_CACHE_MAX_FRAMES", "1"))
+        self.ocr_cache_max_bytes = int(os.getenv("OCR_CACHE_MAX_BYTES", str(8 << 20)))
+        # frames stay in memory, only written to `screenshots/` for debugging
+        self.save_screenshots = os.getenv("SAVE_SCREENSHOTS", "") in ("1", "true")
+        # SoM and OCR debug images, written by a background thread, off by default
+        self.debug_artifacts = os.getenv("DEBUG_ARTIFACTS", "") in ("1", "true")
+        # newest files kept per debug directory (0 keeps all), and the writes
+        # that may wait before new ones are dropped
+        self.debug_artifacts_keep = int(os.getenv("DEBUG_ARTIFACTS_KEEP", "50"))
+        self.debug_queue_size = int(os.getenv("DEBUG_QUEUE_SIZE", "8"))
+        # "auto", or one of "xshm", "imagegrab", "pyautogui", "screencapture"
+        self.capture_backend = os.getenv("CAPTURE_BACKEND", "auto")
+        # "full", "crop" (changed region only) or "overview" (downscaled + crop)
+        self.capture_mode = os.getenv("CAPTURE_MODE", "full")
+        self.capture_tile_size = int(os.getenv("CAPTURE_TILE_SIZE", "32"))
+        self.capture_crop_margin = int(os.getenv("CAPTURE_CROP_MARGIN", "32"))
+        self.capture_crop_min_size = int(os.getenv("CAPTURE_CROP_MIN_SIZE", "256"))
+        # crops covering more than this share of the screen send the full frame
+        self.capture_crop_max_ratio = float(os.getenv("CAPTURE_CROP_MAX_RATIO", "0.6"))
+        self.capture_overview_scale = float(os.getenv("CAPTURE_OVERVIEW_SCALE", "0.5"))
+        # upload encoding: "auto" picks per provider, or force "jpeg"/"webp"/"png"
+        self.image_format = os.getenv("IMAGE_FORMAT", "auto")
+        # per-image budgets overriding the provider defaults, 0 keeps the default
+        self.image_max_bytes = int(os.getenv("IMAGE_MAX_BYTES", "0"))
+        self.image_max_tokens = int(os.getenv("IMAGE_MAX_TOKENS", "0"))
+        # OCR-grounded models start OCR on the frame while the model request runs
+        self.ocr_concurrent = os.getenv("OCR_CONCURRENT", "1") in ("1", "true")
+        # OCR reruns only on the tiles that changed since the last frame
+        self.grounding_tile_cache = os.getenv("GROUNDING_TILE_CACHE", "1") in ("1", "true")
+        # the same for YOLO, off by default: the detector sees upscaled crops
+        # and its boxes can differ from a full-frame pass
+        self.detection_tile_cache = os.getenv("DETECTION_TILE_CACHE", "") in ("1", "true")
+        self.grounding_tile_size = int(os.getenv("GROUNDING_TILE_SIZE", "64"))
+        # above this share of changed tiles the whole frame is analyzed again
+        self.grounding_max_dirty = float(os.getenv("GROUNDING_MAX_DIRTY", "0.5"))
+        # "detect" waits for the screen to settle, "sleep" keeps the fixed 1s pacing
+        self.settle_mode = os.getenv("SETTLE_MODE", "detect")
+        self.settle_poll_interval = float(os.getenv("SETTLE_POLL_INTERVAL", "0.05"))
+        self.settle_stable_polls = int(os.getenv("SETTLE_STABLE_POLLS", "2"))
+        self.settle_timeout_scale = float(os.getenv("SETTLE_TIMEOUT_SCALE", "1.0"))
+        # "auto" (XTest on Linux, pyautogui elsewhere), "xtest" or "pyautogui"
+        self.typing_backend = os.getenv("TYPING_BACKEND", "auto")
+        self.typing_interval = float(os.getenv("TYPING_INTERVAL", "0"))
+        self.typing_chunk_size = int(os.getenv("TYPING_CHUNK_SIZE", "64"))
+        # content at least this long is pasted from the clipboard, 0 (the
+        # default) always types: a paste can't be confirmed to have landed
+        self.typing_paste_threshold = int(os.getenv("TYPING_PASTE_THRESHOLD", "0"))
+        # seconds the focused app gets to read the clipboard before it is restored
+        self.typing_paste_restore_delay = float(
+            os.getenv("TYPING_PASTE_RESTORE_DELAY", "0.5")
+        )
+        # "direct" teleports and clicks, "feedback" animates the cursor for demos
+        self.click_mode = os.getenv("CLICK_MODE", "direct")
+        # list the SoM label centers in the prompt as a text coordinate hint
+        self.som_label_hint = os.getenv("SOM_LABEL_HINT", "") in ("1", "true")
+        # conversation history: screenshots kept in full, older ones become text
+        self.history_max_images = int(os.getenv("HISTORY_MAX_IMAGES", "2"))
+        # per-request payload budget, 0 disables
+        self.history_max_bytes = int(os.getenv("HISTORY_MAX_BYTES", "0"))
+        self.history_max_tokens = int(os.getenv("HISTORY_MAX_TOKENS", "0"))
+        # provider calls: attempts per step, backoff bounds in seconds, and the
+        # consecutive failures that open a provider's circuit breaker
+        self.retry_max_attempts = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+        self.retry_base_delay = float(os.getenv("RETRY_BASE_DELAY", "1.0"))
+        self.retry_max_delay = float(os.getenv("RETRY_MAX_DELAY", "30"))
+        self.circuit_failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.circuit_reset_timeout = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+        # stream responses and run each operation as soon as it is complete
+        self.stream_responses = os.getenv("STREAM_RESPONSES", "1") in ("1", "true")
+        # constrain responses to the operations schema where the API supports it
+        self.structured_output = os.getenv("STRUCTURED_OUTPUT", "1") in ("1", "true")
+        self.clients = ClientRegistry()
 
     def initialize_openai(self):
+        from openai import AsyncOpenAI
+
         if self.verbose:
             print("[Config][initialize_openai]")
 
@@ -62,14 +242,20 @@ class Config:
                 )
             api_key = os.getenv("OPENAI_API_KEY")
 
-        client = OpenAI(
-            api_key=api_key,
+        base_url = os.getenv("OPENAI_API_BASE_URL") or None
+        return self.clients.get(
+            "openai",
+            (base_url, api_key),
+            lambda: AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.clients.http_client,
+            ),
         )
-        client.api_key = api_key
-        client.base_url = os.getenv("OPENAI_API_BASE_URL", client.base_url)
-        return client
 
     def initialize_qwen(self):
+        from openai import AsyncOpenAI
+
         if self.verbose:
             print("[Config][initialize_qwen]")
 
@@ -84,15 +270,20 @@ class Config:
                 )
             api_key = os.getenv("QWEN_API_KEY")
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        return self.clients.get(
+            "qwen",
+            (base_url, api_key),
+            lambda: AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.clients.http_client,
+            ),
         )
-        client.api_key = api_key
-        client.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        return client
 
     def initialize_google(self):
+        import google.generativeai as genai
+
         if self.google_api_key:
             if self.verbose:
                 print("[Config][initialize_google] using cached google_api_key")
@@ -103,12 +294,16 @@ class Config:
                     "[Config][initialize_google] no cached google_api_key, try to get from env."
                 )
             api_key = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key, transport="rest")
-        model = genai.GenerativeModel("gemini-pro-vision")
 
-        return model
+        def create_model():
+            genai.configure(api_key=api_key, transport="rest")
+            return genai.GenerativeModel("gemini-pro-vision")
+
+        return self.clients.get("google", (api_key,), create_model)
 
     def initialize_ollama(self):
+        from ollama import AsyncClient
+
         if self.ollama_host:
             if self.verbose:
                 print("[Config][initialize_ollama] using cached ollama host")
@@ -118,15 +313,27 @@ class Config:
                     "[Config][initialize_ollama] no cached ollama host. Assuming ollama running locally."
                 )
             self.ollama_host = os.getenv("OLLAMA_HOST", None)
-        model = Client(host=self.ollama_host)
-        return model
+        # ollama builds its own httpx client, give it the same pool settings
+        return self.clients.get(
+            "ollama",
+            (self.ollama_host,),
+            lambda: AsyncClient(host=self.ollama_host, **self.clients.http_options()),
+        )
 
     def initialize_anthropic(self):
+        import anthropic
+
         if self.anthropic_api_key:
             api_key = self.anthropic_api_key
         else:
             api_key = os.getenv("ANTHROPIC_API_KEY")
-        return anthropic.Anthropic(api_key=api_key)
+        return self.clients.get(
+            "anthropic",
+            (api_key,),
+            lambda: anthropic.AsyncAnthropic(
+                api_key=api_key, http_client=self.clients.http_client
+            ),
+        )
 
     def validation(self, model, voice_mode):
         """
@@ -12,4 +12,52 @@ class ModelNotRecognizedException(Exception):
         super().__init__(self.message)
 
     def __str__(self):
-        return f"{self.message} : {self.model} "
\ No newline at end of file
+        return f"{self.message} : {self.model} "
+
+
+class ResponseParseError(Exception):
+    """Exception raised when a model response is not a valid list of operations.
+
+    Attributes:
+        content -- the response text that failed to parse
+        message -- explanation of the error
+    """
+
+    def __init__(self, content, message="Model response is not valid operations JSON"):
+        self.content = content
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f"{self.message} : {self.content!r}"
+
+
+class GroundingError(Exception):
+    """Exception raised when a click target cannot be located on screen.
+
+    Attributes:
+        target -- the text or label the model asked to click
+        message -- explanation of the error
+    """
+
+    def __init__(self, target, message="Click target not found on screen"):
+        self.target = target
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f"{self.message} : {self.target}"
+
+
+class CircuitOpenError(Exception):
+    """Exception raised when a provider's circuit breaker is rejecting calls.
+
+    Attributes:
+        provider -- the provider whose circuit is open
+        retry_in -- seconds until the breaker lets a trial call through
+    """
+
+    def __init__(self, provider, retry_in):
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"Circuit open for {provider}, retry in {retry_in:.0f}s")
@@ -3,7 +3,6 @@ Self-Operating Computer
 """
 import argparse
 from operate.utils.style import ANSI_BRIGHT_MAGENTA
-from operate.operate import main
 
 
 def main_entry():
@@ -40,8 +39,23 @@ def main_entry():
         required=False,
     )
 
+    parser.add_argument(
+        "--profile-startup",
+        help="Print an import-time breakdown of startup for the model and exit",
+        action="store_true",
+    )
+
     try:
         args = parser.parse_args()
+        if args.profile_startup:
+            from operate.utils.startup import profile_startup
+
+            profile_startup(args.model)
+            return
+
+        # imported here so `--profile-startup` measures a cold interpreter
+        from operate.operate import main
+
         main(
             args.model,
             terminal_prompt=args.prompt,
@@ -1,1067 +1,608 @@
-import base64
-import io
 import json
-import os
-import time
 import traceback
 
-import easyocr
-import ollama
-import pkg_resources
-from PIL import Image
-from ultralytics import YOLO
-
 from operate.config import Config
-from operate.exceptions import ModelNotRecognizedException
+from operate.exceptions import CircuitOpenError, GroundingError, ResponseParseError
+from operate.models.detector import som_detector
+from operate.models.providers import OCR_LANGUAGES, get_provider
+from operate.models.retry import classify, retry_policy
+from operate.models.schema import (
+    operations_schema,
+    parse_stats,
+    response_schema,
+    validate_operation,
+    validate_operations,
+)
 from operate.models.prompts import (
     get_system_prompt,
     get_user_first_message_prompt,
     get_user_prompt,
 )
-from operate.utils.label import (
-    add_labels,
-    get_click_position_in_percent,
-    get_label_coordinates,
+from operate.utils.label import add_labels
+from operate.utils.ocr import (
+    get_text_coordinates,
+    get_text_element,
+    read_screenshot_text,
 )
-from operate.utils.ocr import get_text_coordinates, get_text_element
-from operate.utils.screenshot import capture_screen_with_cursor, compress_screenshot
+from operate.utils.concurrency import run_blocking
+from operate.utils.delta import FrameView, delta_tracker
+from operate.utils.encoder import encode_for_provider
+from operate.utils.history import conversation_history
+from operate.utils.json_repair import repair_json
+from operate.utils.operating_system import CLICK_OPERATIONS
+from operate.utils.pipeline import capture_pipeline
+from operate.utils.stream import OperationStreamParser
 from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RED, ANSI_RESET
-from operate.models.assistant_adapter import call_assistant_with_vision
 
 # Load configuration
 config = Config()
 
+JSON_REMINDER = "**REMEMBER** Only output json format, do not append any other text."
 
-async def get_next_action(model, messages, objective, session_id):
-    if config.verbose:
-        print("[Self-Operating Computer][get_next_action]")
-        print("[Self-Operating Computer][get_next_action] model", model)
-    if model == "gpt-4":
-        return call_gpt_4o(messages), None
-    if model == "qwen-vl":
-        operation = await call_qwen_vl_with_ocr(messages, objective, model)
-        return operation, None
-    if model == "gpt-4-with-som":
-        operation = await call_gpt_4o_labeled(messages, objective, model)
-        return operation, None
-    if model == "gpt-4-with-ocr":
-        operation = await call_gpt_4o_with_ocr(messages, objective, model)
-        return operation, None
-    if model == "gpt-4.1-with-ocr":
-        operation = await call_gpt_4_1_with_ocr(messages, objective, model)
-        return operation, None
-    if model == "o1-with-ocr":
-        operation = await call_o1_with_ocr(messages, objective, model)
-        return operation, None
-    if model == "agent-1":
-        return "coming soon"
-    if model == "gemini-pro-vision":
-        return call_gemini_pro_vision(messages, objective), None
-    if model == "llava":
-        operation = call_ollama_llava(messages)
-        return operation, None
-    if model == "claude-3":
-        operation = await call_claude_3_with_ocr(messages, objective, model)
-        return operation, None
-    if model == "assistant":
-        operation = await call_assistant_with_vision(messages, objective, model)
-        return operation, None
-    raise ModelNotRecognizedException(model)
-
-
-def call_gpt_4o(messages):
-    if config.verbose:
-        print("[call_gpt_4_v]")
-    time.sleep(1)
-    client = config.initialize_openai()
-    try:
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
 
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
+class ChatCompletionsAPI:
+    """
+    OpenAI-compatible chat completions, used for OpenAI and Qwen.
+    """
 
-        if config.verbose:
-            print(
-                "[call_gpt_4_v] user_prompt",
-                user_prompt,
-            )
+    def fatal_errors(self):
+        return ()
+
+    def options(self, spec):
+        if not (spec.structured and config.structured_output):
+            return spec.options
+        return {
+            **spec.options,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "operations",
+                    "strict": True,
+                    "schema": response_schema(spec.grounding),
+                },
+            },
+        }
 
-        vision_message = {
+    def build_message(self, prompt, upload):
+        return {
             "role": "user",
             "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
+                {"type": "text", "text": prompt},
+                *[
+                    {"type": "image_url", "image_url": {"url": encoded.data_url}}
+                    for encoded in upload.encoded
+                ],
             ],
         }
-        messages.append(vision_message)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
+    async def request(self, client, spec, messages):
+        response = await client.chat.completions.create(
+            model=spec.model_id,
             messages=messages,
-            presence_penalty=1,
-            frequency_penalty=1,
+            **self.options(spec),
         )
+        return response.choices[0].message.content
 
-        content = response.choices[0].message.content
-
-        content = clean_json(content)
-
-        assistant_message = {"role": "assistant", "content": content}
-        if config.verbose:
-            print(
-                "[call_gpt_4_v] content",
-                content,
-            )
-        content = json.loads(content)
-
-        messages.append(assistant_message)
-
-        return content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[Operate] That did not work. Trying again {ANSI_RESET}",
-            e,
-        )
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] AI response was {ANSI_RESET}",
-            content,
+    async def stream(self, client, spec, messages):
+        response = await client.chat.completions.create(
+            model=spec.model_id,
+            messages=messages,
+            stream=True,
+            **self.options(spec),
         )
-        if config.verbose:
-            traceback.print_exc()
-        return call_gpt_4o(messages)
-
-
-async def call_qwen_vl_with_ocr(messages, objective, model):
-    if config.verbose:
-        print("[call_qwen_vl_with_ocr]")
-
-    # Construct the path to the file within the package
-    try:
-        time.sleep(1)
-        client = config.initialize_qwen()
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-        confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
+    async def repair(self, client, spec, content, error):
+        return None
 
-        # Call the function to capture the screen with the cursor
-        raw_screenshot_filename = os.path.join(screenshots_dir, "raw_screenshot.png")
-        capture_screen_with_cursor(raw_screenshot_filename)
 
-        # Compress screenshot image to make size be smaller
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.jpeg")
-        compress_screenshot(raw_screenshot_filename, screenshot_filename)
+class AnthropicAPI:
+    """
+    Anthropic messages, with the system prompt as a separate argument.
+    """
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+    def fatal_errors(self):
+        return ()
 
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
+    def options(self, spec):
+        if not (spec.structured and config.structured_output):
+            return spec.options
+        # a forced tool call is Anthropic's way to get schema-shaped JSON
+        return {
+            **spec.options,
+            "tools": [
+                {
+                    "name": "operate",
+                    "description": "Run the next operations on the computer.",
+                    "input_schema": response_schema(spec.grounding),
+                }
+            ],
+            "tool_choice": {"type": "tool", "name": "operate"},
+        }
 
-        vision_message = {
+    def build_message(self, prompt, upload):
+        return {
             "role": "user",
             "content": [
-                {"type": "text",
-                 "text": f"{user_prompt}**REMEMBER** Only output json format, do not append any other text."},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
+                # the encoder keeps each image under the 5MB size limit
+                *[
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": encoded.media_type,
+                            "data": encoded.base64,
+                        },
+                    }
+                    for encoded in upload.encoded
+                ],
+                {"type": "text", "text": prompt},
             ],
         }
-        messages.append(vision_message)
 
-        response = client.chat.completions.create(
-            model="qwen2.5-vl-72b-instruct",
-            messages=messages,
-        )
-
-        content = response.choices[0].message.content
-
-        content = clean_json(content)
-
-        # used later for the messages
-        content_str = content
-
-        content = json.loads(content)
-
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_qwen_vl_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_qwen_vl_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_qwen_vl_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_qwen_vl_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
-
-        # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
-        assistant_message = {"role": "assistant", "content": content_str}
-        messages.append(assistant_message)
-
-        return processed_content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
-        )
-        if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
-
-def call_gemini_pro_vision(messages, objective):
-    """
-    Get the next action for Self-Operating Computer using Gemini Pro Vision
-    """
-    if config.verbose:
-        print(
-            "[Self Operating Computer][call_gemini_pro_vision]",
+    async def request(self, client, spec, messages):
+        response = await client.messages.create(
+            model=spec.model_id,
+            system=messages[0]["content"],
+            messages=messages[1:],
+            **self.options(spec),
         )
-    # sleep for a second
-    time.sleep(1)
-    try:
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-        # sleep for a second
-        time.sleep(1)
-        prompt = get_system_prompt("gemini-pro-vision", objective)
-
-        model = config.initialize_google()
-        if config.verbose:
-            print("[call_gemini_pro_vision] model", model)
-
-        response = model.generate_content([prompt, Image.open(screenshot_filename)])
-
-        content = response.text[1:]
-        if config.verbose:
-            print("[call_gemini_pro_vision] response", response)
-            print("[call_gemini_pro_vision] content", content)
-
-        content = json.loads(content)
+        for block in response.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input)
+        return response.content[0].text
+
+    async def stream(self, client, spec, messages):
+        async with client.messages.stream(
+            model=spec.model_id,
+            system=messages[0]["content"],
+            messages=messages[1:],
+            **self.options(spec),
+        ) as response:
+            async for event in response:
+                if event.type != "content_block_delta":
+                    continue
+                if event.delta.type == "text_delta":
+                    yield event.delta.text
+                elif event.delta.type == "input_json_delta":
+                    yield event.delta.partial_json
+
+    async def repair(self, client, spec, content, error):
+        # rework for json mode output
         if config.verbose:
             print(
-                "[get_next_action][call_gemini_pro_vision] content",
-                content,
+                f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] JSONDecodeError: {error} {ANSI_RESET}"
             )
-
-        return content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[Operate] That did not work. Trying another method {ANSI_RESET}"
+        response = await client.messages.create(
+            model=spec.model_id,
+            system=f"This json string is not valid, when using with json.loads(content) \
+            it throws the following error: {error}, return correct json string. \
+            {JSON_REMINDER}",
+            messages=[{"role": "user", "content": content}],
+            **spec.options,
         )
-        if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-        return call_gpt_4o(messages)
+        return response.content[0].text
 
 
-async def call_gpt_4o_with_ocr(messages, objective, model):
-    if config.verbose:
-        print("[call_gpt_4o_with_ocr]")
-
-    # Construct the path to the file within the package
-    try:
-        time.sleep(1)
-        client = config.initialize_openai()
-
-        confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
+class OllamaAPI:
+    """
+    Ollama chat, with images as raw bytes next to the prompt.
+    """
 
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+    def fatal_errors(self):
+        import ollama
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        return (ollama.ResponseError,)
 
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
+    def options(self, spec):
+        if not (spec.structured and config.structured_output):
+            return spec.options
+        return {**spec.options, "format": operations_schema(spec.grounding)}
 
-        vision_message = {
+    def build_message(self, prompt, upload):
+        return {
             "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
+            "content": prompt,
+            "images": [encoded.data for encoded in upload.encoded],
         }
-        messages.append(vision_message)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-        )
-
-        content = response.choices[0].message.content
-
-        content = clean_json(content)
+    async def request(self, client, spec, messages):
+        content = ""
+        async for part in self.stream(client, spec, messages, stream=False):
+            content += part
+        return content.strip()
 
-        # used later for the messages
-        content_str = content
+    async def stream(self, client, spec, messages, stream=True):
+        import ollama
 
-        content = json.loads(content)
-
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_gpt_4o_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
+        try:
+            response = await client.chat(
+                model=spec.model_id,
+                messages=messages,
+                stream=stream,
+                **self.options(spec),
+            )
+            if not stream:
+                yield response["message"]["content"]
+                return
+            async for part in response:
+                yield part["message"]["content"]
+        except ollama.ResponseError as e:
+            print(
+                f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Operate] Ollama returned an error: {e}. With Ollama installed, run `ollama pull llava` then `ollama serve`. Schema-constrained output needs Ollama 0.5 or newer, or set STRUCTURED_OUTPUT=0{ANSI_RESET}"
+            )
+            raise
+        finally:
+            # Important: Remove the image from the message history.
+            # Ollama will attempt to load each image reference and will
+            # eventually timeout.
+            messages[-1]["images"] = None
 
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
+    async def repair(self, client, spec, content, error):
+        return None
 
-                if config.verbose:
-                    print(
-                        "[call_gpt_4o_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_gpt_4o_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_gpt_4o_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
 
-            else:
-                processed_content.append(operation)
+class GeminiAPI:
+    """
+    Gemini through the blocking `google.generativeai` SDK, one turn per step.
+    """
 
-        # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
-        assistant_message = {"role": "assistant", "content": content_str}
-        messages.append(assistant_message)
+    def fatal_errors(self):
+        return ()
 
-        return processed_content
+    def build_message(self, prompt, upload):
+        return {"role": "user", "content": prompt, "image": upload.view.frames[0].image}
 
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
+    async def request(self, client, spec, messages):
+        # the system prompt carries the objective, the screenshot the state
+        response = await run_blocking(
+            client.generate_content, [messages[0]["content"], messages[-1]["image"]]
         )
         if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
-
-
-async def call_gpt_4_1_with_ocr(messages, objective, model):
-    if config.verbose:
-        print("[call_gpt_4_1_with_ocr]")
-
-    try:
-        time.sleep(1)
-        client = config.initialize_openai()
-
-        confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
-
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
-        messages.append(vision_message)
-
-        response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=messages,
-        )
+            print("[GeminiAPI] response", response)
+        return response.text
 
-        content = response.choices[0].message.content
+    async def stream(self, client, spec, messages):
+        # the blocking SDK has no async stream, the response arrives at once
+        yield await self.request(client, spec, messages)
 
-        content = clean_json(content)
+    async def repair(self, client, spec, content, error):
+        return None
 
-        content_str = content
 
-        content = json.loads(content)
+APIS = {
+    "chat_completions": ChatCompletionsAPI(),
+    "anthropic": AnthropicAPI(),
+    "ollama": OllamaAPI(),
+    "gemini": GeminiAPI(),
+}
 
-        processed_content = []
 
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                reader = easyocr.Reader(["en"])
-
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
+# the field an OCR or SoM model names a point with
+TARGET_FIELDS = {"ocr": "text", "som": "label"}
+# the points each pointer operation acts on, as the prefix of that field and
+# the coordinate keys grounding fills in
+POINTER_FIELDS = {
+    **{name: (("", "x", "y"),) for name in CLICK_OPERATIONS},
+    "drag": (("", "x", "y"), ("to_", "to_x", "to_y")),
+    "scroll": (("", "x", "y"),),
+}
 
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
 
-                if config.verbose:
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+class Upload:
+    """
+    What one step sends to the model: the view the images were cut from, the
+    images encoded for the provider, and the `LabelTable` of a SoM frame.
+    """
 
-        assistant_message = {"role": "assistant", "content": content_str}
-        messages.append(assistant_message)
+    def __init__(self, view, encoded, labels=None):
+        self.view = view
+        self.encoded = encoded
+        self.labels = labels
 
-        return processed_content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
-        )
-        if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
 
+def prepare_upload(frame, model):
+    """
+    Builds the images `model` is shown for `frame`: YOLO-labeled for SoM, the
+    delta view for models that accept crops, otherwise the whole frame.
+    """
+    spec = get_provider(model)
+    labels = None
+    if spec.grounding == "som":
+        labeled_frame, labels = add_labels(frame, som_detector)
+        view = FrameView(frame, [labeled_frame])
+    elif spec.view:
+        view = delta_tracker.view(frame)
+    else:
+        view = FrameView(frame, [frame])
+    encoded = []
+    if spec.encoder:
+        encoded = [encode_for_provider(image, spec.encoder) for image in view.frames]
+    return Upload(view, encoded, labels)
+
+
+async def call_provider(messages, objective, model, dispatch=None):
+    """
+    Gets the next operations from `model`: capture, encode, call, parse and
+    ground, as declared by its `ProviderSpec`. Failed attempts are retried by
+    `retry_policy`; once they run out the spec's fallback model is tried.
 
-async def call_o1_with_ocr(messages, objective, model):
+    With `dispatch` and `config.stream_responses`, the response is streamed
+    and each operation is passed to `dispatch` as soon as it is grounded. The
+    returned list starts with the dispatched operations.
+    """
+    spec = get_provider(model)
+    api = APIS[spec.api]
     if config.verbose:
-        print("[call_o1_with_ocr]")
+        print("[call_provider] model", model)
 
-    # Construct the path to the file within the package
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
-
-        confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
-
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
-        messages.append(vision_message)
-
-        response = client.chat.completions.create(
-            model="o1",
-            messages=messages,
+        return await retry_policy.call(
+            spec.client,
+            lambda: attempt_provider(messages, objective, model, spec, api, dispatch),
+            fatal_errors=api.fatal_errors(),
+            # a target the model couldn't name ("nothing to click") won't turn
+            # up on a retry, the fallback tries a different method right away
+            final_kinds=("grounding",) if spec.fallback else (),
         )
-
-        content = response.choices[0].message.content
-
-        content = clean_json(content)
-
-        # used later for the messages
-        content_str = content
-
-        content = json.loads(content)
-
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_o1_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_o1_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_o1_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_o1_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
-
-        # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
-        assistant_message = {"role": "assistant", "content": content_str}
-        messages.append(assistant_message)
-
-        return processed_content
-
     except Exception as e:
+        if spec.fallback is None:
+            raise
+        # another model can stand in for a provider that keeps failing or is
+        # down, not fix a bad key, a bad request or a bug
+        if classify(e, api.fatal_errors()) == "fatal" and not isinstance(
+            e, CircuitOpenError
+        ):
+            raise
+        retry_policy.metrics["fallbacks"] += 1
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        if spec.api == "anthropic":
+            messages = to_chat_messages(messages)
+        return await call_provider(messages, objective, spec.fallback, dispatch)
 
 
-async def call_gpt_4o_labeled(messages, objective, model):
-    time.sleep(1)
-
+async def attempt_provider(messages, objective, model, spec, api, dispatch=None):
+    """
+    One attempt of `call_provider`, on a fresh frame.
+    """
+    message = None
+    frame = None
     try:
-        client = config.initialize_openai()
+        client = getattr(config, f"initialize_{spec.client}")()
 
         confirm_system_prompt(messages, objective, model)
-        file_path = pkg_resources.resource_filename("operate.models.weights", "best.pt")
-        yolo_model = YOLO(file_path)  # Load your trained model
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        img_base64_labeled, label_coordinates = add_labels(img_base64, yolo_model)
+        # Capture the screen with the cursor into memory
+        frame = await capture_pipeline.next_frame()
+        if spec.grounding == "ocr" and config.ocr_concurrent:
+            # read the screen while the model thinks, unless the prefetch
+            # already started it
+            capture_pipeline.start_stage(
+                "ocr", frame, read_screenshot_text, OCR_LANGUAGES
+            )
+        upload = await capture_pipeline.stage("upload", frame, prepare_upload, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
-
-        if config.verbose:
-            print(
-                "[call_gpt_4_vision_preview_labeled] user_prompt",
-                user_prompt,
-            )
-
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64_labeled}"
-                    },
-                },
-            ],
-        }
-        messages.append(vision_message)
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            presence_penalty=1,
-            frequency_penalty=1,
-        )
-
-        content = response.choices[0].message.content
-
-        content = clean_json(content)
-
-        assistant_message = {"role": "assistant", "content": content}
-
-        messages.append(assistant_message)
-
-        content = json.loads(content)
+        if upload.view.hint:
+            user_prompt = f"{user_prompt}\n{upload.view.hint}"
+        if upload.labels is not None and config.som_label_hint:
+            user_prompt = f"{user_prompt}\n{upload.labels.hint()}"
+        if spec.json_reminder:
+            user_prompt += JSON_REMINDER
         if config.verbose:
-            print(
-                "[call_gpt_4_vision_preview_labeled] content",
-                content,
-            )
-
-        processed_content = []
-
-        for operation in content:
-            print(
-                "[call_gpt_4_vision_preview_labeled] for operation in content",
-                operation,
-            )
-            if operation.get("operation") == "click":
-                label = operation.get("label")
-                if config.verbose:
-                    print(
-                        "[Self Operating Computer][call_gpt_4_vision_preview_labeled] label",
-                        label,
-                    )
-
-                coordinates = get_label_coordinates(label, label_coordinates)
-                if config.verbose:
-                    print(
-                        "[Self Operating Computer][call_gpt_4_vision_preview_labeled] coordinates",
-                        coordinates,
-                    )
-                image = Image.open(
-                    io.BytesIO(base64.b64decode(img_base64))
-                )  # Load the image to get its size
-                image_size = image.size  # Get the size of the image (width, height)
-                click_position_percent = get_click_position_in_percent(
-                    coordinates, image_size
-                )
-                if config.verbose:
-                    print(
-                        "[Self Operating Computer][call_gpt_4_vision_preview_labeled] click_position_percent",
-                        click_position_percent,
-                    )
-                if not click_position_percent:
-                    print(
-                        f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] Failed to get click position in percent. Trying another method {ANSI_RESET}"
-                    )
-                    return call_gpt_4o(messages)
+            print("[call_provider] user_prompt", user_prompt)
 
-                x_percent = f"{click_position_percent[0]:.2f}"
-                y_percent = f"{click_position_percent[1]:.2f}"
-                operation["x"] = x_percent
-                operation["y"] = y_percent
-                if config.verbose:
-                    print(
-                        "[Self Operating Computer][call_gpt_4_vision_preview_labeled] new click operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-            else:
-                if config.verbose:
-                    print(
-                        "[Self Operating Computer][call_gpt_4_vision_preview_labeled] .append none click operation",
-                        operation,
-                    )
-
-                processed_content.append(operation)
-
-            if config.verbose:
-                print(
-                    "[Self Operating Computer][call_gpt_4_vision_preview_labeled] new processed_content",
-                    processed_content,
-                )
-            return processed_content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
-        )
-        if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-        return call_gpt_4o(messages)
-
-
-def call_ollama_llava(messages):
-    if config.verbose:
-        print("[call_ollama_llava]")
-    time.sleep(1)
-    try:
-        model = config.initialize_ollama()
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
+        message = api.build_message(user_prompt, upload)
+        if spec.history:
+            conversation_history.append(messages, message, frame, OCR_LANGUAGES)
+            request_messages = messages
         else:
-            user_prompt = get_user_prompt()
+            request_messages = [messages[0], message]
 
-        if config.verbose:
-            print(
-                "[call_ollama_llava] user_prompt",
-                user_prompt,
+        if dispatch is not None and config.stream_responses:
+            operations, content = await stream_operations(
+                api, client, spec, request_messages, frame, upload, dispatch
             )
-
-        vision_message = {
-            "role": "user",
-            "content": user_prompt,
-            "images": [screenshot_filename],
-        }
-        messages.append(vision_message)
-
-        response = model.chat(
-            model="llava",
-            messages=messages,
-        )
-
-        # Important: Remove the image path from the message history.
-        # Ollama will attempt to load each image reference and will
-        # eventually timeout.
-        messages[-1]["images"] = None
-
-        content = response["message"]["content"].strip()
-
-        content = clean_json(content)
-
-        assistant_message = {"role": "assistant", "content": content}
-        if config.verbose:
-            print(
-                "[call_ollama_llava] content",
-                content,
+        else:
+            content = await api.request(client, spec, request_messages)
+            operations, content = await read_operations(
+                api, client, spec, frame, upload, content
             )
-        content = json.loads(content)
 
-        messages.append(assistant_message)
+        if not any(grounding_targets(op, spec.grounding) for op in operations):
+            # nothing to ground, skip the OCR if it has not started yet
+            capture_pipeline.cancel_stage("ocr", frame)
+
+        # append the assistant message only once grounding worked, so a failed
+        # step doesn't leave a half-finished turn in the history
+        if spec.history:
+            messages.append({"role": "assistant", "content": content})
+            # keep the frame's OCR text before the next prefetch evicts it
+            conversation_history.capture_text(frame, OCR_LANGUAGES)
+        return operations
+
+    except Exception:
+        # drop the unanswered user turn, the next attempt sends its own
+        if message is not None and messages and messages[-1] is message:
+            messages.pop()
+            conversation_history.discard(message)
+        # the next attempt reads a fresh frame
+        if frame is not None:
+            capture_pipeline.cancel_stage("ocr", frame)
+        raise
+
+
+async def read_operations(api, client, spec, frame, upload, content):
+    """
+    Parses and grounds a complete response.
+    """
+    content = clean_json(content)
+    operations, content = await parse_operations(api, client, spec, content)
+    if config.verbose:
+        print("[call_provider] operations", operations)
+    operations = await ground_operations(spec, frame, upload, operations)
+    return operations, content
 
-        return content
 
-    except ollama.ResponseError as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Operate] Couldn't connect to Ollama. With Ollama installed, run `ollama pull llava` then `ollama serve`{ANSI_RESET}",
-            e,
-        )
+async def stream_operations(api, client, spec, messages, frame, upload, dispatch):
+    """
+    Streams the response, grounding and dispatching each operation as soon as
+    its object is complete. Returns the operations and their JSON text.
 
+    A dispatched operation has already acted on the screen, so a failure after
+    the first dispatch ends the step with the operations that ran instead of
+    retrying it; the next step starts from a fresh capture anyway.
+    """
+    parser = OperationStreamParser()
+    dispatched = []
+    try:
+        async for chunk in api.stream(client, spec, messages):
+            for operation in parser.feed(chunk):
+                if config.verbose:
+                    print("[stream_operations] operation", operation)
+                operation = validate_operation(operation, spec.grounding)
+                grounded = await ground_operations(spec, frame, upload, [operation])
+                operation = grounded[0]
+                dispatch(operation)
+                dispatched.append(operation)
     except Exception as e:
+        if isinstance(e, ResponseParseError):
+            parse_stats.record(spec.name, "invalid")
+        if not dispatched:
+            raise
         print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[llava] That did not work. Trying again {ANSI_RESET}",
-            e,
-        )
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] AI response was {ANSI_RESET}",
-            content,
+            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] response failed after {len(dispatched)} operations: {e} {ANSI_RESET}"
         )
-        if config.verbose:
-            traceback.print_exc()
-        return call_ollama_llava(messages)
+        return dispatched, f"[{','.join(parser.sources[: len(dispatched)])}]"
 
+    if parser.done and dispatched:
+        parse_stats.record(spec.name, "repaired" if parser.repaired else "valid")
+        return dispatched, parser.array_text
+    if dispatched:
+        # the response was cut off, keep what already ran
+        return dispatched, f"[{','.join(parser.sources[: len(dispatched)])}]"
+    # no operations streamed, e.g. a single operation object: parse the
+    # response whole (and repair it if need be)
+    return await read_operations(api, client, spec, frame, upload, parser.text)
 
-async def call_claude_3_with_ocr(messages, objective, model):
-    if config.verbose:
-        print("[call_claude_3_with_ocr]")
 
+async def parse_operations(api, client, spec, content):
+    """
+    Returns the validated operations and the JSON text they came from. Invalid
+    JSON is repaired locally first, and by the model only when that fails and
+    its API supports it.
+    """
     try:
-        time.sleep(1)
-        client = config.initialize_anthropic()
-
-        confirm_system_prompt(messages, objective, model)
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
-
-        # downsize screenshot due to 5MB size limit
-        with open(screenshot_filename, "rb") as img_file:
-            img = Image.open(img_file)
-
-            # Convert RGBA to RGB
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
-
-            # Calculate the new dimensions while maintaining the aspect ratio
-            original_width, original_height = img.size
-            aspect_ratio = original_width / original_height
-            new_width = 2560  # Adjust this value to achieve the desired file size
-            new_height = int(new_width / aspect_ratio)
-            if config.verbose:
-                print("[call_claude_3_with_ocr] resizing claude")
-
-            # Resize the image
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # Save the resized and converted image to a BytesIO object for JPEG format
-            img_buffer = io.BytesIO()
-            img_resized.save(
-                img_buffer, format="JPEG", quality=85
-            )  # Adjust the quality parameter as needed
-            img_buffer.seek(0)
-
-            # Encode the resized image as base64
-            img_data = base64.b64encode(img_buffer.getvalue()).decode("utf-8")
-
-        if len(messages) == 1:
-            user_prompt = get_user_first_message_prompt()
-        else:
-            user_prompt = get_user_prompt()
-
-        vision_message = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": img_data,
-                    },
-                },
-                {
-                    "type": "text",
-                    "text": user_prompt
-                    + "**REMEMBER** Only output json format, do not append any other text.",
-                },
-            ],
-        }
-        messages.append(vision_message)
-
-        # anthropic api expect system prompt as an separate argument
-        response = client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=3000,
-            system=messages[0]["content"],
-            messages=messages[1:],
-        )
-
-        content = response.content[0].text
-        content = clean_json(content)
-        content_str = content
+        data = json.loads(content)
+        outcome = "valid"
+    except json.JSONDecodeError as e:
         try:
-            content = json.loads(content)
-        # rework for json mode output
-        except json.JSONDecodeError as e:
-            if config.verbose:
-                print(
-                    f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] JSONDecodeError: {e} {ANSI_RESET}"
-                )
-            response = client.messages.create(
-                model="claude-3-opus-20240229",
-                max_tokens=3000,
-                system=f"This json string is not valid, when using with json.loads(content) \
-                it throws the following error: {e}, return correct json string. \
-                **REMEMBER** Only output json format, do not append any other text.",
-                messages=[{"role": "user", "content": content}],
-            )
-            content = response.content[0].text
-            content = clean_json(content)
-            content_str = content
-            content = json.loads(content)
-
-        if config.verbose:
-            print(
-                f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] content: {content} {ANSI_RESET}"
-            )
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_claude_3_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
+            repaired = repair_json(content)
+            data = json.loads(repaired)
+            content, outcome = repaired, "repaired"
+        except json.JSONDecodeError:
+            repaired = await api.repair(client, spec, content, e)
+            try:
+                if repaired is None:
+                    raise e
+                repaired = clean_json(repaired)
+                data = json.loads(repaired)
+                content, outcome = repaired, "model_repaired"
+            except json.JSONDecodeError as error:
+                parse_stats.record(spec.name, "invalid")
+                raise ResponseParseError(content, str(error)) from error
+    try:
+        operations = validate_operations(data, spec.grounding)
+    except ResponseParseError:
+        parse_stats.record(spec.name, "invalid")
+        raise
+    parse_stats.record(spec.name, outcome)
+    return operations, content
 
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
 
-                # limit the text to extract has a higher success rate
-                text_element_index = get_text_element(
-                    result, text_to_click[:3], screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+def grounding_targets(operation, grounding):
+    """
+    Returns `(target, x key, y key)` for each point of `operation` that an OCR
+    or SoM model names by its `text` or `label` rather than by coordinates.
+    """
+    field = TARGET_FIELDS.get(grounding)
+    if field is None:
+        return []
+    targets = []
+    for prefix, x_key, y_key in POINTER_FIELDS.get(operation.get("operation"), ()):
+        target = operation.get(prefix + field)
+        # a scroll target is optional
+        if target is not None:
+            targets.append((target, x_key, y_key))
+    return targets
+
+
+async def ground_operations(spec, frame, upload, operations):
+    """
+    Fills in screen coordinates for the pointer operations (clicks, drag
+    endpoints, scroll targets): mapped back from a cropped view, looked up in
+    the OCR result, or taken from the SoM label.
+    """
+    operations = upload.view.map_operations(operations)
+    for operation in operations:
+        targets = grounding_targets(operation, spec.grounding)
+        for target, x_key, y_key in targets:
+            if spec.grounding == "ocr":
+                # OCR runs once per captured frame, usually already prefetched
+                result = await capture_pipeline.stage(
+                    "ocr", frame, read_screenshot_text, OCR_LANGUAGES
                 )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_claude_3_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_claude_3_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_claude_3_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
+                text_element_index = get_text_element(result, target, frame)
+                coordinates = get_text_coordinates(result, text_element_index, frame)
+                operation[x_key] = coordinates["x"]
+                operation[y_key] = coordinates["y"]
             else:
-                processed_content.append(operation)
-
-        assistant_message = {"role": "assistant", "content": content_str}
-        messages.append(assistant_message)
-
-        return processed_content
-
-    except Exception as e:
-        print(
-            f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
-        )
-        if config.verbose:
-            print("[Self-Operating Computer][Operate] error", e)
-            traceback.print_exc()
-            print("message before convertion ", messages)
-
-        # Convert the messages to the GPT-4 format
-        gpt4_messages = [messages[0]]  # Include the system message
-        for message in messages[1:]:
-            if message["role"] == "user":
-                # Update the image type format from "source" to "url"
-                updated_content = []
-                for item in message["content"]:
-                    if isinstance(item, dict) and "type" in item:
-                        if item["type"] == "image":
-                            updated_content.append(
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{item['source']['data']}"
-                                    },
-                                }
-                            )
-                        else:
-                            updated_content.append(item)
-
-                gpt4_messages.append({"role": "user", "content": updated_content})
-            elif message["role"] == "assistant":
-                gpt4_messages.append(
-                    {"role": "assistant", "content": message["content"]}
-                )
+                # the centers were computed when the frame was labeled
+                center = upload.labels.center(target) if upload.labels else None
+                if center is None:
+                    raise GroundingError(target, "The label was not found in the image")
+                operation[x_key] = f"{center[0]:.2f}"
+                operation[y_key] = f"{center[1]:.2f}"
+        if targets and config.verbose:
+            print("[ground_operations] final operation", operation)
+    return operations
+
+
+def to_chat_messages(messages):
+    """
+    Converts Anthropic-format messages to the chat completions format.
+    """
+    chat_messages = [messages[0]]  # Include the system message
+    for message in messages[1:]:
+        if message["role"] == "user":
+            # Update the image type format from "source" to "url"
+            updated_content = []
+            for item in message["content"]:
+                if isinstance(item, dict) and item.get("type") == "image":
+                    updated_content.append(
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{item['source']['media_type']};base64,{item['source']['data']}"
+                            },
+                        }
+                    )
+                else:
+                    updated_content.append(item)
 
-        return gpt_4_fallback(gpt4_messages, objective, model)
+            chat_messages.append({"role": "user", "content": updated_content})
+        elif message["role"] == "assistant":
+            chat_messages.append({"role": "assistant", "content": message["content"]})
+    return chat_messages
 
 
 def get_last_assistant_message(messages):
@@ -1078,22 +619,6 @@ def get_last_assistant_message(messages):
     return None  # Return None if no assistant message is found
 
 
-def gpt_4_fallback(messages, objective, model):
-    if config.verbose:
-        print("[gpt_4_fallback]")
-    system_prompt = get_system_prompt("gpt-4o", objective)
-    new_system_message = {"role": "system", "content": system_prompt}
-    # remove and replace the first message in `messages` with `new_system_message`
-
-    messages[0] = new_system_message
-
-    if config.verbose:
-        print("[gpt_4_fallback][updated]")
-        print("[gpt_4_fallback][updated] len(messages)", len(messages))
-
-    return call_gpt_4o(messages)
-
-
 def confirm_system_prompt(messages, objective, model):
     """
     On `Exception` we default to `call_gpt_4_vision_preview` so we have this function to reassign system prompt in case of a previous failure
@@ -1119,23 +644,20 @@ def confirm_system_prompt(messages, objective, model):
 
 
 def clean_json(content):
+    """
+    Strips the Markdown fence models like to wrap their JSON in.
+    """
     if config.verbose:
         print("\n\n[clean_json] content before cleaning", content)
-    if content.startswith("```json"):
-        content = content[
-            len("```json") :
-        ].strip()  # Remove starting ```json and trim whitespace
-    elif content.startswith("```"):
-        content = content[
-            len("```") :
-        ].strip()  # Remove starting ``` and trim whitespace
+    content = content.strip()
+    if content.startswith("```"):
+        # drop the opening fence with its language tag
+        content = content[3:]
+        if content.startswith("json"):
+            content = content[len("json") :]
     if content.endswith("```"):
-        content = content[
-            : -len("```")
-        ].strip()  # Remove ending ``` and trim whitespace
-
-    # Normalize line breaks and remove any unwanted characters
-    content = "\n".join(line.strip() for line in content.splitlines())
+        content = content[: -len("```")]
+    content = content.strip()
 
     if config.verbose:
         print("\n\n[clean_json] content after cleaning", content)
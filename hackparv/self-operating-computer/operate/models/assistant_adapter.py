@@ -6,18 +6,15 @@ with the self-operating-computer framework, allowing AI-powered computer
 control through the Assistant's reasoning capabilities.
 """
 
-import base64
 import json
 import os
-import time
 import traceback
 import requests
-from PIL import Image
 
 from operate.config import Config
-from operate.models.prompts import get_system_prompt
-from operate.utils.screenshot import capture_screen_with_cursor
-from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RED, ANSI_RESET
+from operate.utils.concurrency import run_blocking
+from operate.utils.pipeline import capture_pipeline
+from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RESET
 
 # Load configuration
 config = Config()
@@ -42,18 +39,17 @@ class AssistantAdapter:
         )
         self.session_messages = []
 
-    def encode_screenshot(self, screenshot_path):
+    def encode_screenshot(self, frame):
         """
         Encode a screenshot as base64 for transmission to Assistant.
 
         Args:
-            screenshot_path: Path to the screenshot file
+            frame: The captured screen `Frame`
 
         Returns:
             Base64-encoded string of the image
         """
-        with open(screenshot_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode("utf-8")
+        return frame.base64("PNG")
 
     def prepare_prompt(self, objective, is_first_message=False):
         """
@@ -226,22 +222,14 @@ async def call_assistant_with_vision(messages, objective, model):
         print("[call_assistant_with_vision]")
 
     try:
-        time.sleep(1)
-
         # Initialize the adapter
         adapter = AssistantAdapter()
 
-        # Create screenshots directory
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-
-        # Capture screenshot
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        # Capture screenshot into memory
+        frame = await capture_pipeline.next_frame()
 
         # Encode screenshot
-        screenshot_base64 = adapter.encode_screenshot(screenshot_filename)
+        screenshot_base64 = await run_blocking(adapter.encode_screenshot, frame)
 
         # Determine if this is the first message
         is_first_message = len(messages) == 1
@@ -254,7 +242,9 @@ async def call_assistant_with_vision(messages, objective, model):
             print(f"[call_assistant_with_vision] Objective: {objective}")
 
         # Call Assistant API
-        response = adapter.call_assistant_api(screenshot_base64, prompt, objective)
+        response = await run_blocking(
+            adapter.call_assistant_api, screenshot_base64, prompt, objective
+        )
 
         if config.verbose:
             print(f"[call_assistant_with_vision] Received response: {response}")
@@ -0,0 +1,109 @@
+import os
+import threading
+
+from PIL import Image
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights")
+
+
+class SoMDetector:
+    """
+    Keeps the Set-of-Mark YOLO detector resident for the whole session.
+
+    The weights are deserialized on first use (or by `warm_up`) and shared by
+    every step afterwards. CPU-friendly exports of `best.pt` (`best.onnx`,
+    `best.torchscript`) are preferred when they sit next to it; create them
+    with `export`.
+    """
+
+    # checked in order, the first file found in the weights directory is loaded
+    weight_files = ("best.onnx", "best.torchscript", "best.pt")
+
+    def __init__(self, weights_path=None):
+        self._weights_path = weights_path
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._predict_lock = threading.Lock()
+
+    @property
+    def weights_path(self):
+        if self._weights_path:
+            return self._weights_path
+        override = os.getenv("SOM_WEIGHTS_PATH")
+        if override:
+            return override
+        for name in self.weight_files:
+            path = os.path.join(WEIGHTS_DIR, name)
+            if os.path.exists(path):
+                return path
+        return os.path.join(WEIGHTS_DIR, "best.pt")
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        """
+        Loads the detector once and returns it.
+        """
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                from ultralytics import YOLO
+
+                weights_path = self.weights_path
+                if config.verbose:
+                    print("[SoMDetector] loading", weights_path)
+                model = YOLO(weights_path, task="detect")
+                if weights_path.endswith(".pt"):
+                    try:
+                        # fold batch norm into the conv layers for faster CPU inference
+                        model.fuse()
+                    except Exception as e:
+                        if config.verbose:
+                            print("[SoMDetector] fuse skipped:", e)
+                self._model = model
+        return self._model
+
+    def warm_up(self, background=False):
+        """
+        Loads the detector and runs one dummy inference so the first real step
+        does not pay for weight deserialization or lazy backend setup.
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, daemon=True)
+            thread.start()
+            return thread
+        try:
+            self.detect(Image.new("RGB", (640, 640)))
+        except Exception as e:
+            print("[SoMDetector][warm_up] error:", e)
+        return None
+
+    def detect(self, frame):
+        """
+        Runs the detector on `frame` (a PIL image or numpy array). Inference is
+        serialized because ultralytics predictors are not thread-safe.
+        """
+        model = self.load()
+        with self._predict_lock:
+            return model(frame, verbose=False)
+
+    def export(self, format="onnx", **kwargs):
+        """
+        Exports `best.pt` next to itself (e.g. `format="onnx"` or
+        `"torchscript"`) so later sessions load the faster format.
+        """
+        from ultralytics import YOLO
+
+        model = YOLO(os.path.join(WEIGHTS_DIR, "best.pt"))
+        return model.export(format=format, **kwargs)
+
+
+som_detector = SoMDetector()
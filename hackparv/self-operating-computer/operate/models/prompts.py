@@ -13,24 +13,39 @@ You are operating a {operating_system} computer, using the same operating system
 
 From looking at the screen, the objective, and your previous actions, take the next best series of action. 
 
-You have 4 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
+You have 8 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
 
 1. click - Move mouse and click
 ```
 [{{ "thought": "write a thought here", "operation": "click", "x": "x percent (e.g. 0.10)", "y": "y percent (e.g. 0.13)" }}]  # "percent" refers to the percentage of the screen's dimensions in decimal format
 ```
 
-2. write - Write with your keyboard
+2. double_click / right_click - Move mouse and double click, or click with the right button to open a context menu
+```
+[{{ "thought": "write a thought here", "operation": "double_click", "x": "x percent (e.g. 0.10)", "y": "y percent (e.g. 0.13)" }}]
+```
+
+3. drag - Press the mouse at one point and release it at another, e.g. to move a file or a slider, or to select text
+```
+[{{ "thought": "write a thought here", "operation": "drag", "x": "start x percent", "y": "start y percent", "to_x": "end x percent", "to_y": "end y percent" }}]
+```
+
+4. scroll - Scroll the mouse wheel up, down, left or right, by `amount` clicks. Give `x` and `y` to scroll over that point, or null to scroll where the mouse is
+```
+[{{ "thought": "write a thought here", "operation": "scroll", "direction": "down", "amount": 5, "x": "x percent or null", "y": "y percent or null" }}]
+```
+
+5. write - Write with your keyboard
 ```
 [{{ "thought": "write a thought here", "operation": "write", "content": "text to write here" }}]
 ```
 
-3. press - Use a hotkey or press key to operate the computer
+6. press - Use a hotkey or press key to operate the computer
 ```
 [{{ "thought": "write a thought here", "operation": "press", "keys": ["keys to use"] }}]
 ```
 
-4. done - The objective is completed
+7. done - The objective is completed
 ```
 [{{ "thought": "write a thought here", "operation": "done", "summary": "summary of what was completed" }}]
 ```
@@ -71,22 +86,34 @@ You are operating a {operating_system} computer, using the same operating system
 
 From looking at the screen, the objective, and your previous actions, take the next best series of action. 
 
-You have 4 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
+You have 8 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
 
 1. click - Move mouse and click - We labeled the clickable elements with red bounding boxes and IDs. Label IDs are in the following format with `x` being a number: `~x`
 ```
 [{{ "thought": "write a thought here", "operation": "click", "label": "~x" }}]  # 'percent' refers to the percentage of the screen's dimensions in decimal format
 ```
-2. write - Write with your keyboard
+2. double_click / right_click - Double click a labeled element, or click it with the right button to open a context menu
+```
+[{{ "thought": "write a thought here", "operation": "double_click", "label": "~x" }}]
+```
+3. drag - Press the mouse on one labeled element and release it on another, e.g. to move a file into a folder
+```
+[{{ "thought": "write a thought here", "operation": "drag", "label": "~x", "to_label": "~y" }}]
+```
+4. scroll - Scroll the mouse wheel up, down, left or right, by `amount` clicks. Give a `label` to scroll over that element, or null to scroll where the mouse is
+```
+[{{ "thought": "write a thought here", "operation": "scroll", "direction": "down", "amount": 5, "label": "~x or null" }}]
+```
+5. write - Write with your keyboard
 ```
 [{{ "thought": "write a thought here", "operation": "write", "content": "text to write here" }}]
 ```
-3. press - Use a hotkey or press key to operate the computer
+6. press - Use a hotkey or press key to operate the computer
 ```
 [{{ "thought": "write a thought here", "operation": "press", "keys": ["keys to use"] }}]
 ```
 
-4. done - The objective is completed
+7. done - The objective is completed
 ```
 [{{ "thought": "write a thought here", "operation": "done", "summary": "summary of what was completed" }}]
 ```
@@ -128,27 +155,38 @@ Objective: {objective}
 """
 
 
-# TODO: Add an example or instruction about `Action: press ['pagedown']` to scroll
 SYSTEM_PROMPT_OCR = """
 You are operating a {operating_system} computer, using the same operating system as a human.
 
 From looking at the screen, the objective, and your previous actions, take the next best series of action. 
 
-You have 4 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
+You have 8 possible operation actions available to you. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement.
 
 1. click - Move mouse and click - Look for text to click. Try to find relevant text to click, but if there's nothing relevant enough you can return `"nothing to click"` for the text value and we'll try a different method.
 ```
 [{{ "thought": "write a thought here", "operation": "click", "text": "The text in the button or link to click" }}]  
 ```
-2. write - Write with your keyboard
+2. double_click / right_click - Double click the text, or click it with the right button to open a context menu
+```
+[{{ "thought": "write a thought here", "operation": "double_click", "text": "The text to double click" }}]
+```
+3. drag - Press the mouse on one text and release it on another, e.g. to move a file into a folder
+```
+[{{ "thought": "write a thought here", "operation": "drag", "text": "The text to start from", "to_text": "The text to drop on" }}]
+```
+4. scroll - Scroll the mouse wheel up, down, left or right, by `amount` clicks. Give a `text` to scroll over it, or null to scroll where the mouse is
+```
+[{{ "thought": "write a thought here", "operation": "scroll", "direction": "down", "amount": 5, "text": "Text in the area to scroll, or null" }}]
+```
+5. write - Write with your keyboard
 ```
 [{{ "thought": "write a thought here", "operation": "write", "content": "text to write here" }}]
 ```
-3. press - Use a hotkey or press key to operate the computer
+6. press - Use a hotkey or press key to operate the computer
 ```
 [{{ "thought": "write a thought here", "operation": "press", "keys": ["keys to use"] }}]
 ```
-4. done - The objective is completed
+7. done - The objective is completed
 ```
 [{{ "thought": "write a thought here", "operation": "done", "summary": "summary of what was completed" }}]
 ```
@@ -196,14 +234,14 @@ Objective: {objective}
 """
 
 OPERATE_FIRST_MESSAGE_PROMPT = """
-Please take the next best action. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement. Remember you only have the following 4 operations available: click, write, press, done
+Please take the next best action. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement. Remember you only have the following 8 operations available: click, double_click, right_click, drag, scroll, write, press, done
 
 You just started so you are in the terminal app and your code is running in this terminal tab. To leave the terminal, search for a new program on the OS. 
 
 Action:"""
 
 OPERATE_PROMPT = """
-Please take the next best action. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement. Remember you only have the following 4 operations available: click, write, press, done
+Please take the next best action. The `pyautogui` library will be used to execute your decision. Your output will be used in a `json.loads` loads statement. Remember you only have the following 8 operations available: click, double_click, right_click, drag, scroll, write, press, done
 Action:"""
 
 
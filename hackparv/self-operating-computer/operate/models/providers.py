@@ -0,0 +1,216 @@
+"""
+Declarative provider registry.
+
+Each model declares the API it speaks, the `Config.initialize_*` client it
+uses, the encoder profile for its uploads, how its clicks are grounded and
+where to fall back on failure. `operate.models.apis.call_provider` runs the
+shared capture → encode → call → parse → ground pipeline for every entry;
+models with their own protocol name a `handler` coroutine instead.
+
+Implementation modules are imported on first use, so a run only pays for the
+SDKs and vision dependencies of the model it selected.
+"""
+import importlib
+
+from operate.config import Config
+from operate.exceptions import ModelNotRecognizedException
+
+# Load configuration
+config = Config()
+
+OCR_LANGUAGES = ["en"]
+
+
+class ProviderSpec:
+    """
+    How to talk to one model.
+
+    Attributes:
+        api (str): Request format, a key of `operate.models.apis.APIS`.
+        client (str): `Config.initialize_<client>` builds the SDK client.
+        model_id (str): Model name sent to the API.
+        encoder (str): `ENCODER_PROFILES` key for uploads, None to send the frame.
+        grounding (str): "coordinates" (model gives x/y), "ocr" or "som".
+        view (bool): Upload the delta view rather than the whole frame.
+        history (bool): Keep the conversation in `messages`.
+        options (dict): Extra request parameters.
+        json_reminder (bool): Repeat the JSON-only instruction in the user turn.
+        structured (bool): Constrain the response to the operations schema
+            with the API's native structured-output mode, if it has one.
+        fallback (str): Model to switch to once the retries are exhausted,
+            None to re-raise.
+        handler (str): "module:function" coroutine replacing the pipeline.
+    """
+
+    def __init__(
+        self,
+        api=None,
+        client=None,
+        model_id=None,
+        encoder=None,
+        grounding="coordinates",
+        view=True,
+        history=True,
+        options=None,
+        json_reminder=False,
+        structured=True,
+        fallback="gpt-4",
+        handler=None,
+    ):
+        self.api = api
+        self.client = client
+        self.model_id = model_id
+        self.encoder = encoder
+        self.grounding = grounding
+        self.view = view
+        self.history = history
+        self.options = options or {}
+        self.json_reminder = json_reminder
+        self.structured = structured
+        self.fallback = fallback
+        self.handler = handler
+        # set from the registry key below
+        self.name = None
+        self._call = None
+
+    def load(self):
+        """
+        Imports and returns the coroutine that runs this model.
+        """
+        if self._call is None:
+            module, function = (
+                self.handler or "operate.models.apis:call_provider"
+            ).split(":")
+            self._call = getattr(importlib.import_module(module), function)
+        return self._call
+
+
+def _openai(model_id, **kwargs):
+    return ProviderSpec(
+        api="chat_completions",
+        client="openai",
+        model_id=model_id,
+        encoder="openai",
+        **kwargs,
+    )
+
+
+PROVIDERS = {
+    "gpt-4": _openai(
+        "gpt-4o",
+        options={"presence_penalty": 1, "frequency_penalty": 1},
+        fallback=None,
+    ),
+    "gpt-4-with-som": _openai(
+        "gpt-4o",
+        grounding="som",
+        view=False,
+        options={"presence_penalty": 1, "frequency_penalty": 1},
+    ),
+    "gpt-4-with-ocr": _openai("gpt-4o", grounding="ocr"),
+    "gpt-4.1-with-ocr": _openai("gpt-4.1", grounding="ocr"),
+    "o1-with-ocr": _openai("o1", grounding="ocr"),
+    "qwen-vl": ProviderSpec(
+        api="chat_completions",
+        client="qwen",
+        model_id="qwen2.5-vl-72b-instruct",
+        encoder="qwen",
+        grounding="ocr",
+        json_reminder=True,
+        # DashScope's compatible mode has no JSON schema response format
+        structured=False,
+    ),
+    "claude-3": ProviderSpec(
+        api="anthropic",
+        client="anthropic",
+        model_id="claude-3-opus-20240229",
+        encoder="anthropic",
+        grounding="ocr",
+        options={"max_tokens": 3000},
+        json_reminder=True,
+    ),
+    "gemini-pro-vision": ProviderSpec(
+        api="gemini",
+        client="google",
+        model_id="gemini-pro-vision",
+        view=False,
+        history=False,
+    ),
+    "llava": ProviderSpec(
+        api="ollama",
+        client="ollama",
+        model_id="llava",
+        encoder="ollama",
+        view=False,
+        fallback=None,
+    ),
+    "assistant": ProviderSpec(
+        handler="operate.models.assistant_adapter:call_assistant_with_vision",
+        fallback=None,
+    ),
+}
+for name, spec in PROVIDERS.items():
+    spec.name = name
+
+# Models that ground `click` operations by running OCR on the screenshot
+OCR_MODELS = tuple(name for name, spec in PROVIDERS.items() if spec.grounding == "ocr")
+
+
+def get_provider(model):
+    try:
+        return PROVIDERS[model]
+    except KeyError:
+        raise ModelNotRecognizedException(model)
+
+
+def warm_up(model):
+    """
+    Starts loading the model's grounding weights in the background, while the
+    user is entering the objective.
+    """
+    spec = PROVIDERS.get(model)
+    grounding = spec.grounding if spec else None
+    if grounding == "ocr":
+        from operate.utils.ocr import reader_pool
+
+        reader_pool.warm_up(OCR_LANGUAGES, background=True)
+    elif grounding == "som":
+        from operate.models.detector import som_detector
+
+        som_detector.warm_up(background=True)
+
+
+def get_prefetch_stages(model):
+    """
+    The per-frame work `capture_pipeline.prefetch` starts for `model`'s next
+    step, as `(name, fn, args)` tuples matching the pipeline's `stage()` calls.
+    """
+    spec = get_provider(model)
+    if spec.handler:
+        return []
+
+    from operate.models.apis import prepare_upload
+    from operate.utils.ocr import read_screenshot_text
+
+    stages = [("upload", prepare_upload, (model,))]
+    # with OCR_CONCURRENT off, OCR runs when a click is grounded
+    if spec.grounding == "ocr" and config.ocr_concurrent:
+        stages.append(("ocr", read_screenshot_text, (OCR_LANGUAGES,)))
+    return stages
+
+
+async def get_next_action(model, messages, objective, session_id, dispatch=None):
+    """
+    Returns the next operations and the session id. Pipeline models stream
+    them to `dispatch` as they arrive, when it is given.
+    """
+    if config.verbose:
+        print("[Self-Operating Computer][get_next_action]")
+        print("[Self-Operating Computer][get_next_action] model", model)
+    spec = get_provider(model)
+    call = spec.load()
+    if spec.handler:
+        operation = await call(messages, objective, model)
+    else:
+        operation = await call(messages, objective, model, dispatch=dispatch)
+    return operation, None
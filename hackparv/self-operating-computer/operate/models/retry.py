@@ -0,0 +1,231 @@
+"""
+Retry policy for provider calls.
+
+`RetryPolicy.call` runs one step against a provider with a bounded number of
+attempts. Errors are classified first:
+
+- "retryable": rate limits, 5xx, timeouts and connection errors. Retried after
+  a jittered exponential backoff, or after the `Retry-After` the API asked
+  for, and counted against the provider's circuit breaker.
+- "parse": the response was not valid operations JSON. Retried immediately.
+- "grounding": the click target was not found on screen. Retried immediately
+  with a fresh capture.
+- "fatal": authentication, bad requests and other 4xx, and any error not
+  recognized above, which is more likely a bug than an outage. Not retried.
+
+A provider whose breaker is open fails fast with `CircuitOpenError` until the
+reset timeout lets one trial call through.
+"""
+import asyncio
+import email.utils
+import json
+import random
+import time
+
+from operate.config import Config
+from operate.exceptions import (
+    CircuitOpenError,
+    GroundingError,
+    ModelNotRecognizedException,
+    ResponseParseError,
+)
+
+# Load configuration
+config = Config()
+
+# exception class names (anywhere in the MRO) that mean "try again later",
+# matched by name so no provider SDK has to be imported
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "TransportError",
+    "TimeoutException",
+    "ConnectionError",
+    "TimeoutError",
+    # google.api_core, used by the Gemini SDK
+    "ServiceUnavailable",
+    "ResourceExhausted",
+    "DeadlineExceeded",
+}
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify(error, fatal_errors=()):
+    """
+    Returns "retryable", "parse", "grounding" or "fatal" for `error`.
+    """
+    if isinstance(error, GroundingError):
+        return "grounding"
+    if isinstance(error, (ResponseParseError, json.JSONDecodeError)):
+        return "parse"
+    if isinstance(error, (ModelNotRecognizedException, CircuitOpenError)):
+        return "fatal"
+    if fatal_errors and isinstance(error, fatal_errors):
+        return "fatal"
+    status = _status_code(error)
+    if status is not None:
+        if status in RETRYABLE_STATUS or status >= 500:
+            return "retryable"
+        return "fatal"
+    if any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return "retryable"
+    # a KeyError or TypeError won't go away after a backoff, and must not
+    # count against the provider's circuit breaker
+    return "fatal"
+
+
+def retry_after(error):
+    """
+    Seconds the API asked us to wait in `Retry-After`, or None.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and stays
+    open for `reset_timeout` seconds, then lets one trial call through.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+
+    def check(self):
+        if self.state != "open":
+            return
+        retry_in = self._opened_at + config.circuit_reset_timeout - time.monotonic()
+        if retry_in > 0:
+            raise CircuitOpenError(self.provider, retry_in)
+        self.state = "half_open"
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        threshold = config.circuit_failure_threshold
+        if self.state == "half_open" or self.failures >= threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Shared retry loop and per-provider breakers, with counters for `summary()`.
+    """
+
+    def __init__(self):
+        self.breakers = {}
+        self.metrics = {
+            "attempts": 0,
+            "successes": 0,
+            "failures": {},
+            "fallbacks": 0,
+            "backoff_seconds": 0.0,
+        }
+
+    def breaker(self, provider):
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(provider)
+        return self.breakers[provider]
+
+    def backoff(self, attempt, error):
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, config.retry_max_delay)
+        # full jitter keeps concurrent clients from retrying in lockstep
+        ceiling = min(
+            config.retry_max_delay, config.retry_base_delay * 2 ** (attempt - 1)
+        )
+        return random.uniform(0, ceiling)
+
+    async def call(self, provider, attempt, fatal_errors=(), final_kinds=()):
+        """
+        Awaits `attempt()` until it succeeds, a fatal error occurs or the
+        attempts run out; the last error is re-raised.
+        Args:
+            provider (str): Circuit breaker key, e.g. the client name.
+            attempt (callable): Returns a new coroutine for each attempt.
+            fatal_errors (tuple): Extra exception types never to retry.
+            final_kinds (tuple): Error kinds the caller handles itself on the
+                first occurrence, e.g. "grounding" when a fallback exists.
+        """
+        breaker = self.breaker(provider)
+        max_attempts = max(1, config.retry_max_attempts)
+        for number in range(1, max_attempts + 1):
+            breaker.check()
+            self.metrics["attempts"] += 1
+            try:
+                result = await attempt()
+            except Exception as error:
+                kind = classify(error, fatal_errors)
+                failures = self.metrics["failures"]
+                failures[kind] = failures.get(kind, 0) + 1
+                if kind == "retryable":
+                    breaker.record_failure()
+                if kind == "fatal" or kind in final_kinds or number == max_attempts:
+                    raise
+                delay = self.backoff(number, error) if kind == "retryable" else 0.0
+                self.metrics["backoff_seconds"] += delay
+                print(
+                    f"[RetryPolicy] {provider} attempt {number}/{max_attempts} "
+                    f"failed ({kind}): {error}. Retrying in {delay:.1f}s"
+                )
+                if delay:
+                    await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                self.metrics["successes"] += 1
+                return result
+
+    def summary(self):
+        return dict(
+            self.metrics,
+            circuits={
+                provider: {
+                    "state": breaker.state,
+                    "failures": breaker.failures,
+                    "opened": breaker.opened,
+                }
+                for provider, breaker in self.breakers.items()
+            },
+        )
+
+
+retry_policy = RetryPolicy()
@@ -0,0 +1,189 @@
+"""
+Typed schema of the operations a model may return.
+
+Each `Operation` declares the operation names it covers and the fields they
+need. The same declarations give the JSON schema sent to providers with a
+native structured-output mode (OpenAI `json_schema`, Anthropic tool use,
+Ollama `format`) and validate whatever came back, so a malformed response is
+caught, and counted per model, before anything runs.
+"""
+import json
+
+from operate.exceptions import ResponseParseError
+from operate.utils.operating_system import CLICK_OPERATIONS
+
+STRING = {"type": "string"}
+# the prompts ask for "0.10"-style strings, numbers are fine as well
+PERCENT = {"type": ["string", "number"]}
+
+# how each grounding mode names the click target
+CLICK_TARGETS = {
+    "coordinates": {"x": PERCENT, "y": PERCENT},
+    "ocr": {"text": STRING},
+    "som": {"label": STRING},
+}
+# and the point a drag ends at
+DRAG_TARGETS = {
+    "coordinates": {"to_x": PERCENT, "to_y": PERCENT},
+    "ocr": {"to_text": STRING},
+    "som": {"to_label": STRING},
+}
+
+
+def _nullable(fields):
+    return {
+        name: dict(schema, type=list(schema["type"]) + ["null"])
+        if isinstance(schema["type"], list)
+        else dict(schema, type=[schema["type"], "null"])
+        for name, schema in fields.items()
+    }
+
+
+class Operation:
+    """
+    One operation type.
+
+    Attributes:
+        names (tuple): The `operation` values it covers.
+        fields (dict): Required field name -> JSON schema.
+        defaults (dict): Values used when the model leaves a field out.
+        optional (dict): Field name -> JSON schema of fields that may be
+            null or left out.
+    """
+
+    def __init__(self, names, fields, defaults=None, optional=None):
+        self.names = names
+        self.fields = fields
+        self.defaults = defaults or {}
+        self.optional = optional or {}
+
+    def json_schema(self):
+        properties = {
+            "thought": STRING,
+            "operation": {"type": "string", "enum": list(self.names)},
+            **self.fields,
+            # strict mode has no optional properties, only nullable ones
+            **_nullable(self.optional),
+        }
+        return {
+            "type": "object",
+            "properties": properties,
+            # strict structured outputs want every property listed
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+
+    def validate(self, operation):
+        # a null field is left out, so its default applies
+        operation = {
+            **self.defaults,
+            **{name: value for name, value in operation.items() if value is not None},
+        }
+        missing = [name for name in self.fields if operation.get(name) is None]
+        if missing:
+            raise ResponseParseError(
+                json.dumps(operation),
+                f"{operation['operation']} is missing {', '.join(missing)}",
+            )
+        if isinstance(operation.get("keys"), str):
+            operation["keys"] = [operation["keys"]]
+        return operation
+
+
+def operation_types(grounding):
+    """
+    The operations a model with the given grounding mode may return.
+    """
+    return [
+        Operation(tuple(CLICK_OPERATIONS), CLICK_TARGETS[grounding]),
+        Operation(("write",), {"content": STRING}),
+        Operation(("press", "hotkey"), {"keys": {"type": "array", "items": STRING}}),
+        Operation(
+            ("scroll",),
+            {
+                "direction": {
+                    "type": "string",
+                    "enum": ["up", "down", "left", "right"],
+                },
+                "amount": {"type": "integer"},
+            },
+            defaults={"direction": "down", "amount": 5},
+            # where to scroll, else wherever the mouse is
+            optional=CLICK_TARGETS[grounding],
+        ),
+        Operation(("drag",), {**CLICK_TARGETS[grounding], **DRAG_TARGETS[grounding]}),
+        Operation(("done",), {}, defaults={"summary": ""}, optional={"summary": STRING}),
+    ]
+
+
+def operations_schema(grounding):
+    """
+    JSON schema of the operations array.
+    """
+    return {
+        "type": "array",
+        "items": {"anyOf": [op.json_schema() for op in operation_types(grounding)]},
+    }
+
+
+def response_schema(grounding):
+    """
+    The operations array wrapped in an object, for APIs whose structured
+    output must be an object.
+    """
+    return {
+        "type": "object",
+        "properties": {"operations": operations_schema(grounding)},
+        "required": ["operations"],
+        "additionalProperties": False,
+    }
+
+
+def validate_operation(operation, grounding):
+    """
+    Returns `operation` checked against its type, with defaults filled in.
+    """
+    if not isinstance(operation, dict) or not isinstance(
+        operation.get("operation"), str
+    ):
+        raise ResponseParseError(json.dumps(operation), "Expected an operation object")
+    operation = dict(operation, operation=operation["operation"].lower())
+    for operation_type in operation_types(grounding):
+        if operation["operation"] in operation_type.names:
+            return operation_type.validate(operation)
+    raise ResponseParseError(
+        json.dumps(operation), f"Unknown operation {operation['operation']}"
+    )
+
+
+def validate_operations(data, grounding):
+    """
+    Returns the validated operations of a decoded response: a list, a single
+    operation, or the `{"operations": [...]}` object of a structured output.
+    """
+    if isinstance(data, dict):
+        data = data["operations"] if "operations" in data else [data]
+    if not isinstance(data, list):
+        raise ResponseParseError(json.dumps(data), "Expected a JSON list of operations")
+    return [validate_operation(operation, grounding) for operation in data]
+
+
+class ParseStats:
+    """
+    Counts how each model's responses parsed: "valid", "repaired" locally,
+    "model_repaired" by another request, or "invalid" when they could not be
+    decoded or did not match the schema.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def record(self, model, outcome):
+        counts = self.counts.setdefault(model, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def summary(self):
+        return {model: dict(counts) for model, counts in self.counts.items()}
+
+
+parse_stats = ParseStats()
@@ -1,6 +1,5 @@
 import sys
 import os
-import time
 import asyncio
 from prompt_toolkit.shortcuts import message_dialog
 from prompt_toolkit import prompt
@@ -22,8 +21,16 @@ from operate.utils.style import (
     ANSI_BLUE,
     style,
 )
-from operate.utils.operating_system import OperatingSystem
-from operate.models.apis import get_next_action
+from operate.utils.operating_system import CLICK_OPERATIONS, OperatingSystem
+from operate.utils.settle import settle_metrics, wait_for_settle
+from operate.models.providers import get_next_action, get_prefetch_stages, warm_up
+from operate.models.retry import retry_policy
+from operate.models.schema import parse_stats
+from operate.utils.concurrency import run_blocking
+from operate.utils.debug import debug_sink
+from operate.utils.history import conversation_history
+from operate.utils.pipeline import capture_pipeline
+from operate.utils.tiles import tile_caches
 
 # Load configuration
 config = Config()
@@ -49,6 +56,9 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     config.verbose = verbose_mode
     config.validation(model, voice_mode)
 
+    # Load the OCR or YOLO weights while the user is entering the objective
+    warm_up(model)
+
     if voice_mode:
         try:
             from whisper_mic import WhisperMic
@@ -100,6 +110,64 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     system_message = {"role": "system", "content": system_prompt}
     messages = [system_message]
 
+    # one event loop for the whole session, so clients and their connections
+    # live across steps
+    asyncio.run(run_agent(model, messages, objective))
+    # let the debug images queued by the last steps reach the disk
+    debug_sink.flush()
+
+    if config.verbose:
+        print("[Self Operating Computer] settle waits", settle_metrics.summary())
+        print("[Self Operating Computer] request payloads", conversation_history.summary())
+        print("[Self Operating Computer] pipeline stages", capture_pipeline.summary())
+        print("[Self Operating Computer] clients", config.clients.summary())
+        print("[Self Operating Computer] provider retries", retry_policy.summary())
+        print("[Self Operating Computer] response parsing", parse_stats.summary())
+        print("[Self Operating Computer] debug artifacts", debug_sink.summary())
+        for name, cache in tile_caches.items():
+            print(f"[Self Operating Computer] {name} tile cache", cache.summary())
+
+
+class OperationDispatcher:
+    """
+    Runs one step's operations in order, each as soon as it is dispatched, so
+    streamed operations start while the model is still writing the rest.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.dispatched = 0
+        self.stop = False
+        self._last = None
+
+    def dispatch(self, operation):
+        self.dispatched += 1
+        self._last = asyncio.ensure_future(self._run(self._last, operation))
+
+    async def _run(self, previous, operation):
+        if previous is not None:
+            await previous
+        if not self.stop:
+            # input injection and settle waits block, keep them off the loop
+            self.stop = await run_blocking(operate, [operation], self.model)
+
+    async def finish(self, operations):
+        """
+        Dispatches the operations after the already dispatched ones and waits
+        for all of them. Returns True when the objective is done.
+        """
+        for operation in operations[self.dispatched :]:
+            self.dispatch(operation)
+        if self._last is not None:
+            await self._last
+        return self.stop
+
+
+async def run_agent(model, messages, objective):
+    """
+    The agent loop: ask the model for the next operations and run them until
+    it is done or the step limit is reached.
+    """
     loop_count = 0
 
     session_id = None
@@ -108,14 +176,20 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
         if config.verbose:
             print("[Self Operating Computer] loop_count", loop_count)
         try:
-            operations, session_id = asyncio.run(
-                get_next_action(model, messages, objective, session_id)
+            dispatcher = OperationDispatcher(model)
+            operations, session_id = await get_next_action(
+                model, messages, objective, session_id, dispatch=dispatcher.dispatch
             )
 
-            stop = operate(operations, model)
+            # run whatever was not streamed to the dispatcher already
+            stop = await dispatcher.finish(operations)
             if stop:
                 break
 
+            # the screen has settled, prepare the next step's frame while the
+            # loop moves on
+            capture_pipeline.prefetch(get_prefetch_stages(model))
+
             loop_count += 1
             if loop_count > 10:
                 break
@@ -130,6 +204,9 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
             )
             break
 
+    capture_pipeline.cancel()
+    await config.clients.aclose()
+
 
 def operate(operations, model):
     if config.verbose:
@@ -137,8 +214,6 @@ def operate(operations, model):
     for operation in operations:
         if config.verbose:
             print("[Self Operating Computer][operate] operation", operation)
-        # wait one second
-        time.sleep(1)
         operate_type = operation.get("operation").lower()
         operate_thought = operation.get("thought")
         operate_detail = ""
@@ -153,13 +228,23 @@ def operate(operations, model):
             content = operation.get("content")
             operate_detail = content
             operating_system.write(content)
-        elif operate_type == "click":
+        elif operate_type in CLICK_OPERATIONS:
             x = operation.get("x")
             y = operation.get("y")
             click_detail = {"x": x, "y": y}
             operate_detail = click_detail
 
-            operating_system.mouse(click_detail)
+            operating_system.mouse(click_detail, **CLICK_OPERATIONS[operate_type])
+        elif operate_type == "drag":
+            start = {"x": operation.get("x"), "y": operation.get("y")}
+            end = {"x": operation.get("to_x"), "y": operation.get("to_y")}
+            operate_detail = {"from": start, "to": end}
+            operating_system.drag(start, end)
+        elif operate_type == "scroll":
+            direction = operation.get("direction", "down")
+            amount = operation.get("amount", 5)
+            operate_detail = {"direction": direction, "amount": amount}
+            operating_system.scroll(direction, amount, operation)
         elif operate_type == "done":
             summary = operation.get("summary")
 
@@ -184,4 +269,7 @@ def operate(operations, model):
         print(f"{operate_thought}")
         print(f"{ANSI_BLUE}Action: {ANSI_RESET}{operate_type} {operate_detail}\n")
 
+        # let the screen react before the next operation or capture
+        wait_for_settle(operate_type)
+
     return False
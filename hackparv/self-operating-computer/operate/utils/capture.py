@@ -0,0 +1,403 @@
+"""
+Screen capture backends.
+
+`get_capture_backend()` picks the fastest backend available on the platform
+and keeps it (and its display connection) alive for the whole session.
+"""
+import ctypes
+import ctypes.util
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+
+from PIL import Image
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+class CaptureBackend:
+    """
+    Base class for screen capture backends. `grab` returns a PIL image of the
+    whole screen.
+    """
+
+    name = "base"
+    # shortest settle poll interval worth using, so polling the screen does
+    # not cost more than the fixed sleep it replaces
+    min_poll_interval = 0.0
+
+    def size(self):
+        raise NotImplementedError
+
+    def grab(self):
+        raise NotImplementedError
+
+    def thumbnail(self, reduce):
+        """
+        A greyscale image of the screen, `reduce` times smaller on each side,
+        for the settle check. Backends that can grab or decode at a lower
+        resolution override this.
+        """
+        return self.grab().reduce(reduce).convert("L")
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    name = "pyautogui"
+
+    def size(self):
+        import pyautogui
+
+        return tuple(pyautogui.size())
+
+    def grab(self):
+        import pyautogui
+
+        return pyautogui.screenshot()
+
+
+class ScreencaptureBackend(CaptureBackend):
+    """
+    macOS `screencapture` utility, the only backend that includes the cursor.
+    """
+
+    name = "screencapture"
+    # every grab runs a process and writes a file
+    min_poll_interval = 0.25
+
+    def size(self):
+        return self.grab().size
+
+    def thumbnail(self, reduce):
+        # a JPEG without the cursor encodes faster than the PNG, and `draft`
+        # decodes it at up to 1/8 scale straight from the DCT coefficients
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "settle.jpg")
+            subprocess.run(["screencapture", "-x", "-t", "jpg", file_path])
+            with Image.open(file_path) as img:
+                width, height = img.size
+                img.draft("L", (width // reduce, height // reduce))
+                img = img.convert("L")
+        return img.resize(
+            (max(1, width // reduce), max(1, height // reduce)), Image.BOX
+        )
+
+    def grab(self):
+        # `screencapture` can only write to a file, load it straight back
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "screenshot.png")
+            subprocess.run(["screencapture", "-C", file_path])
+            with Image.open(file_path) as img:
+                img.load()
+                return img.copy()
+
+
+class ImageGrabBackend(CaptureBackend):
+    """
+    Pillow's X11 grab, with a long-lived Xlib connection for the screen size.
+    """
+
+    name = "imagegrab"
+
+    def __init__(self):
+        import Xlib.display
+
+        self._display = Xlib.display.Display()
+
+    def size(self):
+        screen = self._display.screen()
+        return screen.width_in_pixels, screen.height_in_pixels
+
+    def grab(self):
+        from PIL import ImageGrab
+
+        width, height = self.size()
+        return ImageGrab.grab(bbox=(0, 0, width, height))
+
+    def close(self):
+        self._display.close()
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class _XImage(ctypes.Structure):
+    # only the leading fields are read, the struct is always allocated by Xlib
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+# int (*)(Display *, XErrorEvent *)
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class XShmBackend(CaptureBackend):
+    """
+    X11 MIT-SHM grab. The X server writes the framebuffer straight into a
+    shared memory segment attached once at startup, so nothing is copied
+    through the X socket. Requires a local display with the MIT-SHM extension.
+    """
+
+    name = "xshm"
+
+    _ZPIXMAP = 2
+    _IPC_PRIVATE = 0
+    _IPC_CREAT = 0o1000
+    _IPC_RMID = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._attached = False
+        self._x11 = self._load("X11")
+        self._xext = self._load("Xext")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._declare()
+
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Cannot open X display")
+        if not self._xext.XShmQueryExtension(self._display):
+            self._x11.XCloseDisplay(self._display)
+            raise OSError("X server does not support MIT-SHM")
+
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, screen)
+        self._width = self._x11.XDisplayWidth(self._display, screen)
+        self._height = self._x11.XDisplayHeight(self._display, screen)
+        self._shminfo = _XShmSegmentInfo()
+        self._image = self._xext.XShmCreateImage(
+            self._display,
+            self._x11.XDefaultVisual(self._display, screen),
+            self._x11.XDefaultDepth(self._display, screen),
+            self._ZPIXMAP,
+            None,
+            ctypes.byref(self._shminfo),
+            self._width,
+            self._height,
+        )
+        if not self._image:
+            self._x11.XCloseDisplay(self._display)
+            raise OSError("XShmCreateImage failed")
+        image = self._image.contents
+        if image.bits_per_pixel != 32:
+            self._x11.XFree(self._image)
+            self._x11.XCloseDisplay(self._display)
+            raise OSError(f"Unsupported pixel format ({image.bits_per_pixel} bpp)")
+
+        self._stride = image.bytes_per_line
+        self._buffer_size = self._stride * self._height
+        self._shminfo.shmid = self._libc.shmget(
+            self._IPC_PRIVATE, self._buffer_size, self._IPC_CREAT | 0o600
+        )
+        if self._shminfo.shmid < 0:
+            self.close()
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        self._shminfo.shmaddr = self._libc.shmat(self._shminfo.shmid, None, 0)
+        if self._shminfo.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self._shminfo.shmaddr = None
+            self.close()
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        image.data = self._shminfo.shmaddr
+        self._shminfo.readOnly = 0
+        if not self._attach():
+            self.close()
+            raise OSError("XShmAttach failed")
+        # the segment is freed once both processes have detached from it
+        self._libc.shmctl(self._shminfo.shmid, self._IPC_RMID, None)
+
+    def _attach(self):
+        """
+        Attaches the segment to the X server. Returns False if the server
+        refused, e.g. with BadAccess on a remote or forwarded display that
+        advertises MIT-SHM; Xlib's default error handler would exit instead.
+        """
+        errors = []
+
+        def on_error(display, event):
+            errors.append(event)
+            return 0
+
+        handler = _XErrorHandler(on_error)
+        previous = self._x11.XSetErrorHandler(ctypes.cast(handler, ctypes.c_void_p))
+        try:
+            attached = self._xext.XShmAttach(
+                self._display, ctypes.byref(self._shminfo)
+            )
+            # errors arrive asynchronously, wait for the server's answer
+            self._x11.XSync(self._display, 0)
+        finally:
+            self._x11.XSetErrorHandler(previous)
+        self._attached = bool(attached) and not errors
+        return self._attached
+
+    @staticmethod
+    def _load(name):
+        path = ctypes.util.find_library(name)
+        if not path:
+            raise OSError(f"lib{name} not found")
+        return ctypes.CDLL(path)
+
+    def _declare(self):
+        x11, xext, libc = self._x11, self._xext, self._libc
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        # handlers are passed as raw pointers, so the previous one (maybe
+        # NULL) can be put back as it came
+        x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.POINTER(_XShmSegmentInfo),
+            ctypes.c_uint,
+            ctypes.c_uint,
+        ]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.POINTER(_XImage),
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+        libc.shmget.restype = ctypes.c_int
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def size(self):
+        return self._width, self._height
+
+    def grab(self):
+        with self._lock:
+            all_planes = ctypes.c_ulong(-1).value
+            if not self._xext.XShmGetImage(
+                self._display, self._root, self._image, 0, 0, all_planes
+            ):
+                raise OSError("XShmGetImage failed")
+            # one copy out of the shared segment, which the next grab overwrites
+            pixels = ctypes.string_at(self._shminfo.shmaddr, self._buffer_size)
+        return Image.frombuffer(
+            "RGB", (self._width, self._height), pixels, "raw", "BGRX", self._stride, 1
+        )
+
+    def close(self):
+        with self._lock:
+            if self._display and self._attached:
+                self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+                self._x11.XSync(self._display, 0)
+                self._attached = False
+            if self._image:
+                # the pixel data lives in the shared segment, not the Xlib heap
+                self._image.contents.data = None
+                self._x11.XFree(self._image)
+                self._image = None
+            if self._shminfo.shmaddr:
+                self._libc.shmdt(self._shminfo.shmaddr)
+                self._shminfo.shmaddr = None
+            if self._display:
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        XShmBackend,
+        ImageGrabBackend,
+        PyAutoGUIBackend,
+        ScreencaptureBackend,
+    )
+}
+
+# tried in order when `CAPTURE_BACKEND` is "auto"
+PLATFORM_BACKENDS = {
+    "Linux": ("xshm", "imagegrab"),
+    "Windows": ("pyautogui",),
+    "Darwin": ("screencapture",),
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_capture_backend(name="auto"):
+    """
+    Creates a capture backend by name, or the first one that works on this
+    platform for "auto".
+    """
+    if name != "auto":
+        return BACKENDS[name]()
+
+    user_platform = platform.system()
+    candidates = PLATFORM_BACKENDS.get(user_platform)
+    if not candidates:
+        raise NotImplementedError(
+            f"The platform you're using ({user_platform}) is not currently supported"
+        )
+    for candidate in candidates[:-1]:
+        try:
+            return BACKENDS[candidate]()
+        except Exception as e:
+            if config.verbose:
+                print(f"[capture] {candidate} backend unavailable:", e)
+    return BACKENDS[candidates[-1]]()
+
+
+def get_capture_backend():
+    """
+    Returns the session-wide capture backend, creating it on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_capture_backend(config.capture_backend)
+                if config.verbose:
+                    print("[capture] using backend", _backend.name)
+    return _backend
@@ -0,0 +1,18 @@
+"""
+Runs blocking work (screen capture, encoding, OCR, YOLO, input injection)
+off the agent's event loop, so it can overlap with network I/O.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# capture, encode, OCR and one spare; OCR and YOLO release the GIL in native code
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="operate")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Awaits `fn(*args, **kwargs)` running on the shared worker pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
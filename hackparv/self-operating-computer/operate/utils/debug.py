@@ -0,0 +1,120 @@
+"""
+Background writer for debug images.
+
+The SoM labeler and OCR grounding can leave images on disk to inspect what the
+model was shown and what was matched. Writing a full-resolution PNG costs
+hundreds of milliseconds, so `DebugSink` does it on its own thread: callers
+queue the image, or a function drawing it, and move on. The sink is off
+unless `DEBUG_ARTIFACTS=1`; disabled, nothing is drawn, encoded or written.
+The queue is bounded, images are dropped rather than stalling the agent when
+the disk falls behind, and each directory keeps its newest
+`debug_artifacts_keep` files.
+"""
+import os
+import queue
+import threading
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+class DebugSink:
+    """
+    A bounded queue of `(directory, name, image)` writes and the daemon
+    thread draining it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "removed": 0}
+
+    @property
+    def enabled(self):
+        return config.debug_artifacts
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=max(1, config.debug_queue_size))
+                self._thread = threading.Thread(
+                    target=self._run, name="debug-sink", daemon=True
+                )
+                self._thread.start()
+
+    def save(self, directory, name, image):
+        """
+        Queues a debug image when debug artifacts are enabled. Returns whether
+        it was queued.
+        Args:
+            image: A PIL image, or a function returning one, called on the
+                writer thread so drawing is skipped too when disabled.
+        """
+        if not self.enabled:
+            return False
+        return self.submit(directory, name, image)
+
+    def submit(self, directory, name, image, retain=True):
+        """
+        Queues a write regardless of `enabled`, for callers with their own
+        switch. `retain=False` skips the retention sweep.
+        """
+        self._start()
+        try:
+            self._queue.put_nowait((directory, name, image, retain))
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if config.verbose:
+                print("[DebugSink] queue full, dropped", name)
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def _run(self):
+        while True:
+            directory, name, image, retain = self._queue.get()
+            try:
+                if callable(image):
+                    image = image()
+                os.makedirs(directory, exist_ok=True)
+                # debug images favour a quick encode over a small file
+                image.save(os.path.join(directory, name), compress_level=1)
+                self.stats["written"] += 1
+                if retain:
+                    self._enforce_retention(directory)
+            except Exception as e:
+                print("[DebugSink] error:", e)
+            finally:
+                self._queue.task_done()
+
+    def _enforce_retention(self, directory):
+        keep = config.debug_artifacts_keep
+        if keep <= 0:
+            return
+        with os.scandir(directory) as entries:
+            files = [entry for entry in entries if entry.is_file()]
+        if len(files) <= keep:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[: len(files) - keep]:
+            try:
+                os.remove(entry.path)
+                self.stats["removed"] += 1
+            except OSError:
+                pass
+
+    def flush(self):
+        """
+        Waits until every queued image is written.
+        """
+        if self._queue is not None:
+            self._queue.join()
+
+    def summary(self):
+        return dict(self.stats)
+
+
+debug_sink = DebugSink()
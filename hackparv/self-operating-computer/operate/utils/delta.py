@@ -0,0 +1,174 @@
+"""
+Region-of-interest capture: send the model only what changed on screen.
+
+`DeltaTracker` remembers the previous frame, finds the dirty rectangle with a
+tiled NumPy comparison and builds a `FrameView` holding the image(s) to upload
+for the configured capture mode:
+
+- "full": the whole frame (default)
+- "crop": only the changed region
+- "overview": a downscaled whole frame plus the changed region at full resolution
+
+`FrameView.to_screen` maps a click given as a percentage of the first image
+back to a percentage of the whole screen.
+"""
+import threading
+
+from operate.config import Config
+from operate.utils.screenshot import Frame
+
+# Load configuration
+config = Config()
+
+CAPTURE_MODES = ("full", "crop", "overview")
+
+
+def dirty_rect(previous, current, tile=32):
+    """
+    Returns the `(x1, y1, x2, y2)` pixel box covering every `tile`-sized tile
+    that differs between two frames, None if nothing changed, or the whole
+    frame if the sizes differ.
+    """
+    import numpy as np
+
+    if previous is None or previous.size != current.size:
+        return (0, 0, current.width, current.height)
+
+    changed = np.any(previous.array != current.array, axis=2)
+    height, width = changed.shape
+    rows = -(-height // tile)
+    cols = -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:height, :width] = changed
+    tiles = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+    tile_rows = np.flatnonzero(tiles.any(axis=1))
+    if tile_rows.size == 0:
+        return None
+    tile_cols = np.flatnonzero(tiles.any(axis=0))
+    return (
+        int(tile_cols[0]) * tile,
+        int(tile_rows[0]) * tile,
+        min(width, (int(tile_cols[-1]) + 1) * tile),
+        min(height, (int(tile_rows[-1]) + 1) * tile),
+    )
+
+
+class FrameView:
+    """
+    The image(s) to upload for one step, and where the first image sits on
+    screen so model coordinates can be mapped back to the full frame.
+    """
+
+    def __init__(self, frame, frames, region=None, hint=""):
+        self.frame = frame
+        self.frames = frames
+        self.region = region or (0, 0, frame.width, frame.height)
+        self.hint = hint
+
+    @property
+    def is_full(self):
+        return self.region == (0, 0, self.frame.width, self.frame.height)
+
+    def to_screen(self, x_percent, y_percent):
+        """
+        Converts a point given as a fraction of the first image into a fraction
+        of the whole screen.
+        """
+        x1, y1, x2, y2 = self.region
+        x = (x1 + float(x_percent) * (x2 - x1)) / self.frame.width
+        y = (y1 + float(y_percent) * (y2 - y1)) / self.frame.height
+        return round(x, 4), round(y, 4)
+
+    def map_operations(self, operations):
+        """
+        Rewrites raw pointer coordinates (clicks, drags, scroll positions) in
+        place from first-image space to screen space.
+        """
+        if self.is_full:
+            return operations
+        for operation in operations:
+            for x_key, y_key in (("x", "y"), ("to_x", "to_y")):
+                if operation.get(x_key) is not None:
+                    operation[x_key], operation[y_key] = self.to_screen(
+                        operation[x_key], operation[y_key]
+                    )
+        return operations
+
+
+class DeltaTracker:
+    """
+    Keeps the previously captured frame and turns each new frame into the
+    `FrameView` for the configured capture mode.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._previous = None
+
+    def _expand(self, rect, frame):
+        margin = config.capture_crop_margin
+        min_size = config.capture_crop_min_size
+        box = list(rect)
+        for axis, limit in ((0, frame.width), (1, frame.height)):
+            lo, hi = box[axis] - margin, box[axis + 2] + margin
+            # grow small regions around their center so the model gets context
+            size = min(max(min_size, hi - lo), limit)
+            lo = min(max(0, (lo + hi - size) // 2), limit - size)
+            box[axis], box[axis + 2] = lo, lo + size
+        return tuple(box)
+
+    def view(self, frame, mode=None):
+        mode = mode or config.capture_mode
+        with self._lock:
+            previous, self._previous = self._previous, frame
+
+        full = FrameView(frame, [frame])
+        if mode == "full" or previous is None:
+            return full
+
+        rect = dirty_rect(previous, frame, config.capture_tile_size)
+        if rect is None:
+            return full
+        x1, y1, x2, y2 = self._expand(rect, frame)
+        area = (x2 - x1) * (y2 - y1)
+        if area >= config.capture_crop_max_ratio * frame.width * frame.height:
+            return full
+
+        crop = Frame(frame.image.crop((x1, y1, x2, y2)), frame.captured_at)
+        region_text = (
+            f"({x1 / frame.width:.2f}, {y1 / frame.height:.2f}) to "
+            f"({x2 / frame.width:.2f}, {y2 / frame.height:.2f})"
+        )
+        if mode == "crop":
+            return FrameView(
+                frame,
+                [crop],
+                region=(x1, y1, x2, y2),
+                hint=f"The image shows only the part of the screen that changed since "
+                f"the last action, the region from {region_text} of the screen. "
+                f"Give click coordinates relative to this image.",
+            )
+
+        scale = config.capture_overview_scale
+        overview = Frame(
+            frame.image.resize(
+                (max(1, int(frame.width * scale)), max(1, int(frame.height * scale)))
+            ),
+            frame.captured_at,
+        )
+        return FrameView(
+            frame,
+            [overview, crop],
+            hint=f"The first image is the whole screen at reduced resolution. The "
+            f"second image is the region from {region_text} that changed since the "
+            f"last action, at full resolution. Give click coordinates relative to "
+            f"the first image.",
+        )
+
+
+delta_tracker = DeltaTracker()
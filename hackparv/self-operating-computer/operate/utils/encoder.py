@@ -0,0 +1,207 @@
+"""
+Adaptive screenshot encoding for model uploads.
+
+`encode_for_provider` picks the format, quality and downscale factor that keep
+an image inside the provider's byte and token budget, and records how long the
+encode took and how large the result is.
+"""
+import base64
+import io
+import math
+import time
+
+from PIL import Image
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+def openai_image_tokens(width, height):
+    """Token cost of a high-detail image, per OpenAI's tiling rules."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def anthropic_image_tokens(width, height):
+    """Approximate token cost of an image for Claude models."""
+    return math.ceil(width * height / 750)
+
+
+# Per-provider upload limits. `formats` are tried in order at each scale;
+# small images (crops) try lossless PNG first.
+ENCODER_PROFILES = {
+    "openai": {
+        "formats": ("JPEG", "WEBP"),
+        "quality": 80,
+        "max_bytes": 1 << 20,
+        "max_side": 2048,
+        "max_tokens": None,
+        "tokens": openai_image_tokens,
+    },
+    "qwen": {
+        "formats": ("JPEG", "WEBP"),
+        "quality": 85,
+        "max_bytes": 1 << 20,
+        "max_side": 2560,
+        "max_tokens": None,
+        "tokens": None,
+    },
+    "anthropic": {
+        "formats": ("JPEG", "WEBP"),
+        "quality": 85,
+        # the API rejects images over 5MB, and downsizes anything over ~1.15MP
+        "max_bytes": 5 * 1000 * 1000,
+        "max_side": 2560,
+        "max_tokens": None,
+        "tokens": anthropic_image_tokens,
+    },
+    "ollama": {
+        "formats": ("JPEG",),
+        "quality": 80,
+        "max_bytes": 1 << 20,
+        "max_side": 1344,
+        "max_tokens": None,
+        "tokens": None,
+    },
+}
+
+LOSSY_FORMATS = ("JPEG", "WEBP")
+MIN_QUALITY = 50
+MAX_ATTEMPTS = 4
+# images up to this many pixels are sent as PNG when it fits the budget
+PNG_MAX_PIXELS = 512 * 512
+
+
+class EncodedImage:
+    """
+    One encoded upload: the bytes, how they were produced, and what it cost.
+    """
+
+    def __init__(self, data, format, size, quality, scale, encode_ms):
+        self.data = data
+        self.format = format
+        self.width, self.height = size
+        self.quality = quality
+        self.scale = scale
+        self.encode_ms = encode_ms
+        self._base64 = None
+
+    @property
+    def byte_size(self):
+        return len(self.data)
+
+    @property
+    def media_type(self):
+        return f"image/{self.format.lower()}"
+
+    @property
+    def base64(self):
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("utf-8")
+        return self._base64
+
+    @property
+    def data_url(self):
+        return f"data:{self.media_type};base64,{self.base64}"
+
+    def __repr__(self):
+        return (
+            f"EncodedImage({self.format} {self.width}x{self.height} q={self.quality} "
+            f"scale={self.scale:.2f} {self.byte_size} bytes {self.encode_ms:.1f}ms)"
+        )
+
+
+def _profile(provider):
+    profile = dict(ENCODER_PROFILES[provider])
+    if config.image_max_bytes:
+        profile["max_bytes"] = config.image_max_bytes
+    if config.image_max_tokens:
+        profile["max_tokens"] = config.image_max_tokens
+    if config.image_format != "auto":
+        profile["formats"] = (config.image_format.upper(),)
+    return profile
+
+
+def _initial_scale(profile, width, height):
+    scale = min(1.0, profile["max_side"] / max(width, height))
+    tokens = profile["tokens"]
+    max_tokens = profile["max_tokens"]
+    if tokens and max_tokens:
+        # shrink until the token estimate fits, 10% at a time
+        while scale > 0.1 and tokens(width * scale, height * scale) > max_tokens:
+            scale *= 0.9
+    return scale
+
+
+def _encode(image, format, quality):
+    buffer = io.BytesIO()
+    if format == "PNG":
+        image.save(buffer, format="PNG", optimize=False, compress_level=3)
+    elif format == "WEBP":
+        image.save(buffer, format="WEBP", quality=quality, method=2)
+    else:
+        image.save(buffer, format="JPEG", quality=quality, optimize=False)
+    return buffer.getvalue()
+
+
+def encode_for_provider(frame, provider):
+    """
+    Encodes `frame` for upload to `provider` within its byte and token budget.
+    The result is cached on the frame, so every caller in a step shares it.
+    Args:
+        frame (Frame): The captured screen, or a crop of it.
+        provider (str): A key of `ENCODER_PROFILES`.
+
+    Returns:
+        EncodedImage: The smallest-effort encoding that fits the budget.
+    """
+    cached = frame.encoded.get(provider)
+    if cached is not None:
+        return cached
+
+    profile = _profile(provider)
+    start = time.perf_counter()
+    source = frame.rgb()
+    scale = _initial_scale(profile, frame.width, frame.height)
+    quality = profile["quality"]
+
+    for _ in range(MAX_ATTEMPTS):
+        size = (max(1, round(frame.width * scale)), max(1, round(frame.height * scale)))
+        image = source if size == source.size else source.resize(size, Image.BILINEAR)
+        formats = profile["formats"]
+        if size[0] * size[1] <= PNG_MAX_PIXELS and "PNG" not in formats:
+            formats = ("PNG",) + formats
+
+        # keep the smallest candidate, stop at the first one inside the budget
+        candidates = []
+        for format in formats:
+            data = _encode(image, format, quality)
+            candidates.append((len(data), format, data))
+            if len(data) <= profile["max_bytes"]:
+                break
+        _, format, data = min(candidates)
+        if len(data) <= profile["max_bytes"]:
+            break
+        if any(f in LOSSY_FORMATS for f in formats) and quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - 20)
+        else:
+            # byte size scales roughly with pixel count
+            scale *= max(0.5, min(0.9, math.sqrt(profile["max_bytes"] / len(data))))
+
+    encoded = EncodedImage(
+        data,
+        format,
+        size,
+        quality if format in LOSSY_FORMATS else None,
+        scale,
+        (time.perf_counter() - start) * 1000,
+    )
+    if config.verbose:
+        print(f"[encode_for_provider] {provider}", encoded)
+    frame.encoded[provider] = encoded
+    return encoded
@@ -0,0 +1,212 @@
+"""
+Bounded conversation history for the model loop.
+
+Every step appends a screenshot to `messages`. `ConversationHistory.append`
+keeps the images of the last `history_max_images` screenshots only, replaces
+older ones with a short text summary (step number and the OCR text read from
+that screen, when OCR ran), drops the oldest turns when the request is over
+the byte or token budget, and records the payload size of every step.
+"""
+import threading
+
+from operate.config import Config
+from operate.utils.encoder import openai_image_tokens
+from operate.utils.ocr import cached_screenshot_text
+
+# Load configuration
+config = Config()
+
+# characters of OCR text kept in the summary of a pruned screenshot
+SUMMARY_MAX_CHARS = 400
+# rough token estimate for text and for images whose size is unknown
+CHARS_PER_TOKEN = 4
+DEFAULT_IMAGE_TOKENS = 1000
+
+
+def _is_image_part(part):
+    return isinstance(part, dict) and part.get("type") in ("image_url", "image")
+
+
+def _image_parts(message):
+    content = message.get("content")
+    if not isinstance(content, list):
+        return []
+    return [part for part in content if _is_image_part(part)]
+
+
+def _has_images(message):
+    return bool(message.get("images")) or bool(_image_parts(message))
+
+
+def _part_bytes(part):
+    if part.get("type") == "image_url":
+        return len(part["image_url"]["url"])
+    if part.get("type") == "image":
+        return len(part["source"]["data"])
+    return len(part.get("text") or "")
+
+
+class ConversationHistory:
+    """
+    Tracks the screenshots appended to `messages` and keeps each request
+    within the configured image count and payload budget.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id(message) -> (message, frame, step, image tokens) for live screenshots
+        self._screenshots = {}
+        self._summaries = {}
+        self._step = 0
+        self.payloads = []
+
+    def reset(self):
+        with self._lock:
+            self._screenshots.clear()
+            self._summaries.clear()
+            self._step = 0
+            self.payloads = []
+
+    def append(self, messages, message, frame=None, languages=("en",)):
+        """
+        Appends a user message carrying a screenshot of `frame`, then prunes
+        and trims `messages` in place so the next request fits the budget.
+        """
+        with self._lock:
+            self._step += 1
+            # the previous frame's OCR is still cached, summarize it while we can
+            self._summarize_pending(languages)
+            messages.append(message)
+            tokens = (
+                openai_image_tokens(*frame.size) if frame else DEFAULT_IMAGE_TOKENS
+            )
+            self._screenshots[id(message)] = (message, frame, self._step, tokens)
+            self._prune(messages)
+            self._trim(messages)
+            self._record(messages)
+
+    def discard(self, message):
+        """
+        Forgets a user message that was taken back out of `messages`, e.g.
+        after a failed attempt, with the screenshot it holds.
+        """
+        with self._lock:
+            self._screenshots.pop(id(message), None)
+            self._summaries.pop(id(message), None)
+
+    def capture_text(self, frame, languages=("en",)):
+        """
+        Summarizes the screenshot of `frame` from its cached OCR result once
+        grounding is done, before the next frame's prefetched OCR can evict
+        it. Without a cached result yet, the next `append` tries again.
+        """
+        with self._lock:
+            self._summarize_pending(languages, frame)
+
+    def _summarize_pending(self, languages, only=None):
+        for key, (message, frame, step, tokens) in self._screenshots.items():
+            if frame is None or key in self._summaries:
+                continue
+            if only is not None and frame is not only:
+                continue
+            result = cached_screenshot_text(frame, languages)
+            if only is not None and not result:
+                continue
+            summary = f"[Screenshot from step {step} removed to save space."
+            if result:
+                text = " | ".join(element[1] for element in result)
+                summary += f" Text visible on that screen: {text[:SUMMARY_MAX_CHARS]}"
+            self._summaries[key] = summary + "]"
+            # the summary is all we need from the frame now
+            self._screenshots[key] = (message, None, step, tokens)
+
+    def _prune(self, messages):
+        # the message just appended always keeps its screenshot
+        keep = max(1, config.history_max_images)
+        with_images = [message for message in messages if _has_images(message)]
+        for message in with_images[: len(with_images) - keep]:
+            entry = self._screenshots.pop(id(message), None)
+            summary = self._summaries.pop(id(message), None)
+            if summary is None:
+                step = entry[2] if entry and entry[0] is message else "?"
+                summary = f"[Screenshot from step {step} removed to save space.]"
+            if message.get("images"):
+                message["images"] = None
+                message["content"] = f"{message['content']}\n{summary}"
+                continue
+            content = [part for part in message["content"] if not _is_image_part(part)]
+            content.append({"type": "text", "text": summary})
+            message["content"] = content
+
+    def _measure(self, messages):
+        byte_size = 0
+        tokens = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                byte_size += len(content)
+                tokens += len(content) // CHARS_PER_TOKEN
+                continue
+            for part in content or []:
+                size = _part_bytes(part)
+                byte_size += size
+                if not _is_image_part(part):
+                    tokens += size // CHARS_PER_TOKEN
+            image_count = len(_image_parts(message)) + len(message.get("images") or [])
+            if image_count:
+                entry = self._screenshots.get(id(message))
+                per_image = entry[3] if entry else DEFAULT_IMAGE_TOKENS
+                tokens += image_count * per_image
+            for image in message.get("images") or []:
+                byte_size += len(image)
+        return byte_size, tokens
+
+    def _over_budget(self, messages):
+        byte_size, tokens = self._measure(messages)
+        return (config.history_max_bytes and byte_size > config.history_max_bytes) or (
+            config.history_max_tokens and tokens > config.history_max_tokens
+        )
+
+    def _trim(self, messages):
+        # drop whole turns after the system message, oldest first, always
+        # keeping the new message; a turn ends where the next user message starts
+        while len(messages) > 2 and self._over_budget(messages):
+            end = 2
+            while end < len(messages) - 1 and messages[end]["role"] != "user":
+                end += 1
+            for message in messages[1:end]:
+                self._screenshots.pop(id(message), None)
+                self._summaries.pop(id(message), None)
+            del messages[1:end]
+
+    def _record(self, messages):
+        byte_size, tokens = self._measure(messages)
+        images = sum(1 for message in messages if _has_images(message))
+        self.payloads.append(
+            {
+                "step": self._step,
+                "messages": len(messages),
+                "images": images,
+                "bytes": byte_size,
+                "tokens": tokens,
+            }
+        )
+        if config.verbose:
+            print(
+                f"[ConversationHistory] step {self._step} payload: {len(messages)} "
+                f"messages, {images} images, {byte_size / 1024:.0f}KB, ~{tokens} tokens"
+            )
+
+    def summary(self):
+        if not self.payloads:
+            return {}
+        sizes = [payload["bytes"] for payload in self.payloads]
+        return {
+            "steps": len(self.payloads),
+            "max_bytes": max(sizes),
+            "last_bytes": sizes[-1],
+            "max_tokens": max(payload["tokens"] for payload in self.payloads),
+        }
+
+
+conversation_history = ConversationHistory()
@@ -0,0 +1,102 @@
+"""
+Local repair of almost-JSON model output.
+
+Models sometimes answer with JSON that `json.loads` rejects for a trivial
+reason: a trailing comma, single quotes, `True`/`None`, a raw newline inside a
+string, prose around the array, or a response cut off before its closing
+brackets. `repair_json` fixes those in one pass, so a parse failure does not
+cost another round-trip with the screenshot.
+"""
+import re
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+CLOSERS = {"[": "]", "{": "}"}
+STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+WORD = re.compile(r"[A-Za-z_]+")
+
+
+def _last_significant(out):
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    return index
+
+
+def _drop_trailing_comma(out):
+    index = _last_significant(out)
+    if index >= 0 and out[index] == ",":
+        del out[index]
+
+
+def repair_json(text):
+    """
+    Returns the first JSON value in `text` with the common model mistakes
+    fixed. The result may still be invalid, `json.loads` has the last word.
+    """
+    starts = [index for index in (text.find("["), text.find("{")) if index >= 0]
+    if not starts:
+        return text
+
+    out = []
+    stack = []
+    quote = None
+    escape = False
+    index = min(starts)
+    while index < len(text):
+        char = text[index]
+        index += 1
+        if quote:
+            if escape:
+                escape = False
+                if char == "'":
+                    # \' is not a JSON escape
+                    out[-1] = char
+                    continue
+                out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == quote:
+                quote = None
+                out.append('"')
+            elif char == '"':
+                # a double quote inside a single-quoted string
+                out.append('\\"')
+            else:
+                out.append(STRING_ESCAPES.get(char, char))
+            continue
+
+        if char in "\"'":
+            quote = char
+            out.append('"')
+        elif char in "[{":
+            last = _last_significant(out)
+            if last >= 0 and out[last] in "]}\"" and stack:
+                # a missing comma between two values
+                out.append(",")
+            stack.append(char)
+            out.append(char)
+        elif char in "]}":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                # ignore anything after the value, like a closing fence
+                break
+        elif char.isalpha() or char == "_":
+            word = WORD.match(text, index - 1).group()
+            index += len(word) - 1
+            out.append(PYTHON_LITERALS.get(word, word))
+        else:
+            out.append(char)
+
+    # close what a truncated response left open
+    if quote:
+        if escape:
+            out.pop()
+        out.append('"')
+    for opener in reversed(stack):
+        _drop_trailing_comma(out)
+        out.append(CLOSERS[opener])
+    return "".join(out)
@@ -0,0 +1,186 @@
+"""
+Typing engine for `write` operations.
+
+Text is sent in chunks instead of one `pyautogui.write` call per character:
+through XTest on a persistent X connection on Linux, through a single
+`pyautogui.write` call per chunk elsewhere, and, when `TYPING_PASTE_THRESHOLD`
+is set, through the clipboard for long content.
+"""
+import platform
+import threading
+import time
+
+import pyautogui
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+# keysyms for characters whose latin-1 code point is not their keysym
+SPECIAL_KEYSYMS = {
+    "\n": 0xFF0D,  # Return
+    "\r": 0xFF0D,
+    "\t": 0xFF09,  # Tab
+    "\b": 0xFF08,  # BackSpace
+}
+SHIFT_L = 0xFFE1
+
+
+class PyAutoGUITyper:
+    """
+    Sends each chunk with one `pyautogui.write` call, so pyautogui's pause and
+    failsafe checks run once per chunk instead of once per character.
+    """
+
+    name = "pyautogui"
+
+    def type_chunk(self, chunk, interval=0.0):
+        pyautogui.write(chunk, interval=interval, _pause=False)
+
+
+class XTestTyper:
+    """
+    Injects key events through the XTest extension on a long-lived display
+    connection, flushing once per chunk.
+    """
+
+    name = "xtest"
+
+    def __init__(self):
+        from Xlib import X
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+
+        self._X = X
+        self._xtest = xtest
+        self._display = Display()
+        if not self._display.has_extension("XTEST"):
+            raise OSError("X server does not support XTEST")
+        self._shift = self._display.keysym_to_keycode(SHIFT_L)
+        self._keys = {}
+        self._fallback = PyAutoGUITyper()
+        self._lock = threading.Lock()
+
+    def _key_for(self, char):
+        """
+        Returns `(keycode, needs_shift)` for `char`, or None when the current
+        keyboard mapping has no key for it.
+        """
+        if char not in self._keys:
+            keysym = SPECIAL_KEYSYMS.get(char)
+            if keysym is None:
+                code_point = ord(char)
+                # latin-1 keysyms equal the code point, unicode ones are offset
+                keysym = code_point if code_point < 0x100 else 0x01000000 | code_point
+            keycode = self._display.keysym_to_keycode(keysym)
+            if not keycode:
+                self._keys[char] = None
+            else:
+                needs_shift = (
+                    self._display.keycode_to_keysym(keycode, 0) != keysym
+                    and self._display.keycode_to_keysym(keycode, 1) == keysym
+                )
+                self._keys[char] = (keycode, needs_shift)
+        return self._keys[char]
+
+    def _send(self, keycode, needs_shift):
+        fake_input, X = self._xtest.fake_input, self._X
+        if needs_shift:
+            fake_input(self._display, X.KeyPress, self._shift)
+        fake_input(self._display, X.KeyPress, keycode)
+        fake_input(self._display, X.KeyRelease, keycode)
+        if needs_shift:
+            fake_input(self._display, X.KeyRelease, self._shift)
+
+    def type_chunk(self, chunk, interval=0.0):
+        with self._lock:
+            for char in chunk:
+                key = self._key_for(char)
+                if key is None:
+                    self._display.sync()
+                    self._fallback.type_chunk(char)
+                    continue
+                self._send(*key)
+                if interval:
+                    self._display.sync()
+                    time.sleep(interval)
+            self._display.sync()
+
+
+class TypingEngine:
+    """
+    Types text through the fastest available backend, pasting long content from
+    the clipboard instead of typing it.
+    """
+
+    def __init__(self):
+        self._typer = None
+        self._lock = threading.Lock()
+
+    @property
+    def typer(self):
+        if self._typer is None:
+            with self._lock:
+                if self._typer is None:
+                    self._typer = self._create_typer(config.typing_backend)
+                    if config.verbose:
+                        print("[TypingEngine] using backend", self._typer.name)
+        return self._typer
+
+    @staticmethod
+    def _create_typer(name):
+        if name == "pyautogui":
+            return PyAutoGUITyper()
+        if name == "xtest" or (name == "auto" and platform.system() == "Linux"):
+            try:
+                return XTestTyper()
+            except Exception as e:
+                if name == "xtest":
+                    raise
+                if config.verbose:
+                    print("[TypingEngine] xtest unavailable:", e)
+        return PyAutoGUITyper()
+
+    def paste(self, text):
+        """
+        Pastes `text` through the clipboard, restoring the previous clipboard
+        content afterwards. Returns False if the clipboard is unavailable.
+        """
+        try:
+            import pyperclip
+
+            previous = pyperclip.paste()
+            pyperclip.copy(text)
+        except Exception as e:
+            if config.verbose:
+                print("[TypingEngine] clipboard unavailable:", e)
+            return False
+
+        if platform.system() == "Darwin":
+            pyautogui.hotkey("command", "v", _pause=False)
+        elif platform.system() == "Linux":
+            # terminal emulators don't paste on ctrl+v, most apps take shift+insert
+            pyautogui.hotkey("shift", "insert", _pause=False)
+        else:
+            pyautogui.hotkey("ctrl", "v", _pause=False)
+        # give the focused app time to read the clipboard before restoring it
+        time.sleep(config.typing_paste_restore_delay)
+        try:
+            pyperclip.copy(previous)
+        except Exception:
+            pass
+        return True
+
+    def type(self, text, interval=None, paste=True):
+        interval = config.typing_interval if interval is None else interval
+        threshold = config.typing_paste_threshold
+        if paste and threshold and len(text) >= threshold and self.paste(text):
+            return
+
+        chunk_size = max(1, config.typing_chunk_size)
+        for start in range(0, len(text), chunk_size):
+            self.typer.type_chunk(text[start : start + chunk_size], interval)
+
+
+typing_engine = TypingEngine()
@@ -1,10 +1,23 @@
-import io
-import base64
-import json
-import os
+import functools
 import time
-import asyncio
-from PIL import Image, ImageDraw
+
+import numpy as np
+from PIL import ImageDraw, ImageFont
+
+from operate.config import Config
+from operate.utils.debug import debug_sink
+from operate.utils.screenshot import Frame
+from operate.utils.tiles import TileCache
+
+# Load configuration
+config = Config()
+
+LABELED_IMAGES_DIR = "labeled_images"
+LABEL_FONT_SIZE = 45
+# above this many detections the pairwise overlap matrix gets large, and the
+# grid index is used instead
+GRID_MIN_BOXES = 1024
+GRID_MIN_CELL = 32.0
 
 
 def validate_and_extract_image_data(data):
@@ -26,15 +39,63 @@ def validate_and_extract_image_data(data):
     return image_data.split("base64,")[-1], messages
 
 
-def get_label_coordinates(label, label_coordinates):
+class LabelTable:
     """
-    Retrieves the coordinates for a given label.
-
-    :param label: The label to find coordinates for (e.g., "~1").
-    :param label_coordinates: Dictionary containing labels and their coordinates.
-    :return: Coordinates of the label or None if the label is not found.
+    The labeled boxes of one SoM frame, array-backed: row `i` is label `~i`,
+    with its xyxy box in pixels and its center as a fraction of the frame
+    size, computed once when the frame is labeled.
     """
-    return label_coordinates.get(label)
+
+    def __init__(self, boxes, size):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.size = size
+        width, height = size
+        self.centers = np.column_stack(
+            [
+                (self.boxes[:, 0] + self.boxes[:, 2]) / (2 * width),
+                (self.boxes[:, 1] + self.boxes[:, 3]) / (2 * height),
+            ]
+        )
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def index(self, label):
+        """
+        Row of `label` ("~3", "3" or 3), or None if there is no such label.
+        """
+        try:
+            index = int(str(label).strip().lstrip("~"))
+        except ValueError:
+            return None
+        return index if 0 <= index < len(self.boxes) else None
+
+    def get(self, label, default=None):
+        """
+        The `(x1, y1, x2, y2)` box of `label`, like the dict this table
+        replaces.
+        """
+        index = self.index(label)
+        if index is None:
+            return default
+        return tuple(self.boxes[index].tolist())
+
+    def center(self, label):
+        """
+        The `(x, y)` click position of `label` as a fraction of the screen.
+        """
+        index = self.index(label)
+        if index is None:
+            return None
+        return tuple(self.centers[index].tolist())
+
+    def hint(self, max_labels=None):
+        """
+        The label centers as one compact prompt line.
+        """
+        centers = self.centers[:max_labels].round(3).tolist()
+        entries = " ".join(f"~{i}:{x:g},{y:g}" for i, (x, y) in enumerate(centers))
+        return f"Label centers (x,y as a fraction of the screen): {entries}"
 
 
 def is_overlapping(box1, box2):
@@ -52,109 +113,208 @@ def is_overlapping(box1, box2):
     return True
 
 
-def add_labels(base64_data, yolo_model):
-    image_bytes = base64.b64decode(base64_data)
-    image_labeled = Image.open(io.BytesIO(image_bytes))  # Corrected this line
-    image_debug = image_labeled.copy()  # Create a copy for the debug image
-    image_original = (
-        image_labeled.copy()
-    )  # Copy of the original image for base64 return
-
-    results = yolo_model(image_labeled)
+@functools.lru_cache(maxsize=None)
+def label_font(size=LABEL_FONT_SIZE):
+    """
+    The label font, loaded once per size instead of on every `draw.text` call.
+    """
+    return ImageFont.load_default(size=size)
 
-    draw = ImageDraw.Draw(image_labeled)
-    debug_draw = ImageDraw.Draw(
-        image_debug
-    )  # Create a separate draw object for the debug image
-    font_size = 45
 
-    labeled_images_dir = "labeled_images"
-    label_coordinates = {}  # Dictionary to store coordinates
+def _to_numpy(tensor):
+    if hasattr(tensor, "cpu"):
+        tensor = tensor.cpu().numpy()
+    return np.asarray(tensor, dtype=np.float64)
 
-    if not os.path.exists(labeled_images_dir):
-        os.makedirs(labeled_images_dir)
 
-    counter = 0
-    drawn_boxes = []  # List to keep track of boxes already drawn
+def extract_detections(results):
+    """
+    Returns every detection in `results` as one `(n, 5)` array of xyxy boxes
+    and confidences, in detection order.
+    """
+    arrays = []
     for result in results:
-        if hasattr(result, "boxes"):
-            for det in result.boxes:
-                bbox = det.xyxy[0]
-                x1, y1, x2, y2 = bbox.tolist()
-
-                debug_label = "D_" + str(counter)
-                debug_index_position = (x1, y1 - font_size)
-                debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
-                debug_draw.text(
-                    debug_index_position,
-                    debug_label,
-                    fill="blue",
-                    font_size=font_size,
-                )
-
-                overlap = any(
-                    is_overlapping((x1, y1, x2, y2), box) for box in drawn_boxes
-                )
-
-                if not overlap:
-                    draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
-                    label = "~" + str(counter)
-                    index_position = (x1, y1 - font_size)
-                    draw.text(
-                        index_position,
-                        label,
-                        fill="red",
-                        font_size=font_size,
-                    )
-
-                    # Add the non-overlapping box to the drawn_boxes list
-                    drawn_boxes.append((x1, y1, x2, y2))
-                    label_coordinates[label] = (x1, y1, x2, y2)
-
-                    counter += 1
-
-    # Save the image
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-
-    output_path = os.path.join(labeled_images_dir, f"img_{timestamp}_labeled.png")
-    output_path_debug = os.path.join(labeled_images_dir, f"img_{timestamp}_debug.png")
-    output_path_original = os.path.join(
-        labeled_images_dir, f"img_{timestamp}_original.png"
-    )
+        boxes = getattr(result, "boxes", None)
+        if boxes is None or len(boxes) == 0:
+            continue
+        xyxy = _to_numpy(boxes.xyxy).reshape(-1, 4)
+        conf = _to_numpy(boxes.conf).reshape(-1, 1)
+        arrays.append(np.concatenate([xyxy, conf], axis=1))
+    if not arrays:
+        return np.empty((0, 5))
+    return np.concatenate(arrays)
+
+
+def _shift_detection(detection, dx, dy):
+    x1, y1, x2, y2, conf = detection
+    return x1 + dx, y1 + dy, x2 + dx, y2 + dy, conf
 
-    image_labeled.save(output_path)
-    image_debug.save(output_path_debug)
-    image_original.save(output_path_original)
 
-    buffered_original = io.BytesIO()
-    image_original.save(buffered_original, format="PNG")  # I guess this is needed
-    img_base64_original = base64.b64encode(buffered_original.getvalue()).decode("utf-8")
+def detect_boxes(frame, detector):
+    """
+    Returns the `(n, 4)` xyxy boxes detected in `frame`, most confident first.
+    With `DETECTION_TILE_CACHE`, the detector only reruns on the regions
+    that changed since the last labeled frame; the merged boxes can differ
+    from a full-frame pass, so it is off by default.
+    """
+
+    def run(region):
+        detections = extract_detections(detector.detect(region.image))
+        return [tuple(row) for row in detections.tolist()]
+
+    if config.detection_tile_cache:
+        detections = detection_tiles.analyze(
+            frame, run, lambda detection: detection[:4], _shift_detection
+        )
+        # merged results mix cached and fresh detections, restore the
+        # confidence order the detector returns
+        detections.sort(key=lambda detection: -detection[4])
+    else:
+        detections = run(frame)
+    return np.asarray(detections, dtype=np.float64).reshape(-1, 5)[:, :4]
 
-    # Convert image to base64 for return
-    buffered_labeled = io.BytesIO()
-    image_labeled.save(buffered_labeled, format="PNG")  # I guess this is needed
-    img_base64_labeled = base64.b64encode(buffered_labeled.getvalue()).decode("utf-8")
 
-    return img_base64_labeled, label_coordinates
+def overlap_matrix(boxes):
+    """
+    `(n, n)` bool array, True where two boxes overlap or touch, the same test
+    as `is_overlapping`.
+    """
+    x1, y1, x2, y2 = boxes.T
+    return ~(
+        (x1[:, None] > x2[None, :])
+        | (x1[None, :] > x2[:, None])
+        | (y1[:, None] > y2[None, :])
+        | (y1[None, :] > y2[:, None])
+    )
 
 
-def get_click_position_in_percent(coordinates, image_size):
+class BoxGrid:
+    """
+    Uniform grid over the kept boxes, so an overlap query only tests the boxes
+    that share a cell with it.
     """
-    Calculates the click position at the center of the bounding box and converts it to percentages.
 
-    :param coordinates: A tuple of the bounding box coordinates (x1, y1, x2, y2).
-    :param image_size: A tuple of the image dimensions (width, height).
-    :return: A tuple of the click position in percentages (x_percent, y_percent).
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = []
+
+    def _cells(self, box):
+        x1, y1, x2, y2 = box
+        size = self.cell_size
+        for column in range(int(x1 // size), int(x2 // size) + 1):
+            for row in range(int(y1 // size), int(y2 // size) + 1):
+                yield column, row
+
+    def overlaps(self, box):
+        seen = set()
+        for cell in self._cells(box):
+            for index in self.cells.get(cell, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                if is_overlapping(box, self.boxes[index]):
+                    return True
+        return False
+
+    def insert(self, box):
+        index = len(self.boxes)
+        self.boxes.append(box)
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, []).append(index)
+
+    @classmethod
+    def suppress(cls, boxes, cell_size=None):
+        """
+        `suppress_overlapping` through the grid, for large detection counts.
+        """
+        keep = np.zeros(len(boxes), dtype=bool)
+        if not len(boxes):
+            return keep
+        if cell_size is None:
+            # about one typical box per cell
+            sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+            cell_size = max(GRID_MIN_CELL, float(np.median(sides)))
+        grid = cls(cell_size)
+        for index, box in enumerate(boxes.tolist()):
+            if not grid.overlaps(box):
+                grid.insert(box)
+                keep[index] = True
+        return keep
+
+
+def suppress_overlapping(boxes):
+    """
+    Greedy suppression in detection order: a box is kept unless it overlaps a
+    box kept before it. Returns a bool mask over `boxes`.
+    """
+    count = len(boxes)
+    if count > GRID_MIN_BOXES:
+        return BoxGrid.suppress(boxes)
+    keep = np.zeros(count, dtype=bool)
+    if not count:
+        return keep
+    overlaps = overlap_matrix(boxes)
+    suppressed = np.zeros(count, dtype=bool)
+    for index in range(count):
+        if not suppressed[index]:
+            keep[index] = True
+            suppressed |= overlaps[index]
+    return keep
+
+
+def draw_debug_boxes(image, boxes, keep, font, font_size=LABEL_FONT_SIZE):
     """
-    if not coordinates or not image_size:
-        return None
+    Returns a copy of `image` with every detection outlined in blue, labeled
+    with the number of the next kept box.
+    """
+    image_debug = image.copy()
+    debug_draw = ImageDraw.Draw(image_debug)
+    counter = 0
+    for (x1, y1, x2, y2), kept in zip(boxes.tolist(), keep.tolist()):
+        debug_label = "D_" + str(counter)
+        debug_index_position = (x1, y1 - font_size)
+        debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
+        debug_draw.text(debug_index_position, debug_label, fill="blue", font=font)
+        if kept:
+            counter += 1
+    return image_debug
 
-    # Calculate the center of the bounding box
-    x_center = (coordinates[0] + coordinates[2]) / 2
-    y_center = (coordinates[1] + coordinates[3]) / 2
 
-    # Convert to percentages
-    x_percent = x_center / image_size[0]
-    y_percent = y_center / image_size[1]
+def add_labels(frame, detector):
+    image_labeled = frame.image.copy()
 
-    return x_percent, y_percent
+    boxes = detect_boxes(frame, detector)
+    keep = suppress_overlapping(boxes)
+
+    draw = ImageDraw.Draw(image_labeled)
+    font_size = LABEL_FONT_SIZE
+    font = label_font(font_size)
+
+    # label `~i` is row `i` of the kept boxes
+    labels = LabelTable(boxes[keep], frame.size)
+
+    for counter, (x1, y1, x2, y2) in enumerate(labels.boxes.tolist()):
+        draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
+        label = "~" + str(counter)
+        index_position = (x1, y1 - font_size)
+        draw.text(index_position, label, fill="red", font=font)
+
+    if debug_sink.enabled:
+        # written in the background; the debug overlay is only drawn there
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        prefix = f"img_{timestamp}"
+        debug_sink.save(LABELED_IMAGES_DIR, f"{prefix}_labeled.png", image_labeled)
+        debug_sink.save(
+            LABELED_IMAGES_DIR,
+            f"{prefix}_debug.png",
+            lambda: draw_debug_boxes(frame.image, boxes, keep, font, font_size),
+        )
+        debug_sink.save(LABELED_IMAGES_DIR, f"{prefix}_original.png", frame.image)
+
+    labeled_frame = Frame(image_labeled, frame.captured_at)
+    labeled_frame.labels = labels
+    return labeled_frame, labels
+
+
+detection_tiles = TileCache("detections")
@@ -1,75 +1,436 @@
 from operate.config import Config
-from PIL import Image, ImageDraw
-import os
+from operate.exceptions import GroundingError
+from operate.utils.debug import debug_sink
+from operate.utils.tiles import TileCache
+from PIL import ImageDraw
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
 # Load configuration
 config = Config()
 
+# where the OCR match images go when debug artifacts are enabled
+OCR_DIR = "ocr"
 
-def get_text_element(result, search_text, image_path):
+
+class ReaderPool:
+    """
+    Process-wide pool of warm EasyOCR readers, keyed by language set.
+
+    Building an `easyocr.Reader` loads the detector and recognizer weights from
+    disk, so readers are created lazily, at most `size` per language set, and
+    returned to the pool after each use instead of being thrown away.
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._condition = threading.Condition()
+        self._idle = {}
+        self._created = {}
+
+    @property
+    def size(self):
+        return self._size or max(1, config.ocr_reader_pool_size)
+
+    @staticmethod
+    def _key(languages):
+        return tuple(sorted(set(languages)))
+
+    def _create(self, key):
+        import easyocr
+
+        if config.verbose:
+            print("[ReaderPool] loading EasyOCR reader for", key)
+        return easyocr.Reader(list(key))
+
+    def _acquire(self, key, timeout=None):
+        with self._condition:
+            idle = self._idle.setdefault(key, [])
+            while not idle:
+                if self._created.get(key, 0) < self.size:
+                    # reserve the slot, then load the weights outside the lock
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                if not self._condition.wait(timeout):
+                    raise TimeoutError(f"No EasyOCR reader available for {key}")
+            else:
+                return idle.pop()
+
+        try:
+            return self._create(key)
+        except Exception:
+            with self._condition:
+                self._created[key] -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, key, reader):
+        with self._condition:
+            self._idle.setdefault(key, []).append(reader)
+            self._condition.notify()
+
+    @contextmanager
+    def borrow(self, languages=("en",), timeout=None):
+        """
+        Borrow a loaded reader for `languages`, blocking while all readers for
+        that language set are in use by other sessions.
+        Args:
+            languages (list): EasyOCR language codes, e.g. ["en"].
+            timeout (float): Seconds to wait for a free reader, None waits forever.
+
+        Yields:
+            easyocr.Reader: A reader that is returned to the pool on exit.
+        """
+        key = self._key(languages)
+        reader = self._acquire(key, timeout)
+        try:
+            yield reader
+        finally:
+            self._release(key, reader)
+
+    def warm_up(self, languages=("en",), count=1, background=False):
+        """
+        Load up to `count` readers for `languages` ahead of the first click.
+        Args:
+            languages (list): EasyOCR language codes, e.g. ["en"].
+            count (int): Number of readers to load, capped at the pool size.
+            background (bool): Load on a daemon thread and return immediately.
+
+        Returns:
+            threading.Thread: The loading thread when `background` is set.
+        """
+        if background:
+            thread = threading.Thread(
+                target=self.warm_up, args=(languages, count), daemon=True
+            )
+            thread.start()
+            return thread
+
+        key = self._key(languages)
+        readers = []
+        try:
+            for _ in range(min(count, self.size)):
+                readers.append(self._acquire(key))
+        except Exception as e:
+            print("[ReaderPool][warm_up] error:", e)
+        finally:
+            # the loaded readers go back to the pool even if a later one failed
+            for reader in readers:
+                self._release(key, reader)
+        return None
+
+
+class OCRCache:
+    """
+    LRU cache of EasyOCR results keyed by a content hash of the captured frame.
+
+    Every click in one model response is grounded against the same screenshot,
+    so OCR only has to run once per frame. Entries are evicted oldest first when
+    more than `max_frames` frames are cached or `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_frames=None, max_bytes=None):
+        self._max_frames = max_frames
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_frames(self):
+        return self._max_frames or max(1, config.ocr_cache_max_frames)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or config.ocr_cache_max_bytes
+
+    @staticmethod
+    def _estimate_size(result):
+        # box (4 points), text and confidence per element, plus list overhead
+        return 64 + sum(160 + len(element[1]) for element in result)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Returns the cached result without touching LRU order or counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, result):
+        size = self._estimate_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_frames or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_WHITESPACE = re.compile(r"\s+")
+_TOKEN = re.compile(r"\w+")
+
+
+def _compact(text):
+    return _WHITESPACE.sub("", text.casefold())
+
+
+def _trigrams(compact):
+    return {compact[i : i + 3] for i in range(len(compact) - 2)}
+
+
+def _box_area(box):
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return (max(xs) - min(xs)) * (max(ys) - min(ys))
+
+
+class TextIndex:
+    """
+    Search index over one EasyOCR pass.
+
+    Text is matched case- and whitespace-insensitively through a trigram index
+    and a token index. Candidates are ranked by match tier (exact, substring,
+    all tokens, fuzzy), then similarity, OCR confidence and bounding-box area,
+    and finally by position, so the same query always returns the same element.
+    """
+
+    EXACT, SUBSTRING, TOKENS, FUZZY = 3, 2, 1, 0
+    min_similarity = 0.5
+
+    def __init__(self, result):
+        self.result = result
+        self._compact = []
+        self._token_sets = []
+        self._trigram_counts = []
+        self._rank_keys = []
+        self._tokens = {}
+        self._trigrams = {}
+
+        for index, element in enumerate(result):
+            compact = _compact(element[1])
+            tokens = set(_TOKEN.findall(element[1].casefold()))
+            trigrams = _trigrams(compact)
+            self._compact.append(compact)
+            self._token_sets.append(tokens)
+            self._trigram_counts.append(len(trigrams))
+            self._rank_keys.append((float(element[2]), _box_area(element[0]), -index))
+            for token in tokens:
+                self._tokens.setdefault(token, []).append(index)
+            for trigram in trigrams:
+                self._trigrams.setdefault(trigram, []).append(index)
+
+    def _candidates(self, compact, tokens):
+        query_trigrams = _trigrams(compact)
+        shared = {}
+        for trigram in query_trigrams:
+            for index in self._trigrams.get(trigram, ()):
+                shared[index] = shared.get(index, 0) + 1
+        for token in tokens:
+            for index in self._tokens.get(token, ()):
+                shared.setdefault(index, 0)
+        if len(compact) < 3:
+            # too short for trigrams, fall back to a substring scan
+            for index, text in enumerate(self._compact):
+                if compact in text:
+                    shared.setdefault(index, 0)
+        return shared, len(query_trigrams)
+
+    def search(self, search_text, limit=5):
+        """
+        Returns up to `limit` `(score, index)` pairs, best match first.
+        """
+        compact = _compact(search_text)
+        if not compact:
+            return []
+        tokens = set(_TOKEN.findall(search_text.casefold()))
+        shared, query_count = self._candidates(compact, tokens)
+
+        scored = []
+        for index, count in shared.items():
+            text = self._compact[index]
+            if text == compact:
+                tier, similarity = self.EXACT, 1.0
+            elif compact in text:
+                tier, similarity = self.SUBSTRING, len(compact) / len(text)
+            elif tokens and tokens <= self._token_sets[index]:
+                tier, similarity = self.TOKENS, len(compact) / max(len(text), 1)
+            else:
+                total = query_count + self._trigram_counts[index]
+                similarity = 2 * count / total if total else 0.0
+                if similarity < self.min_similarity:
+                    continue
+                tier = self.FUZZY
+            scored.append(((tier, similarity) + self._rank_keys[index], index))
+
+        scored.sort(reverse=True)
+        return [(score, index) for score, index in scored[:limit]]
+
+    def best(self, search_text):
+        """
+        Returns the index of the best matching element, or None.
+        """
+        matches = self.search(search_text, limit=1)
+        return matches[0][1] if matches else None
+
+
+class OCRResult(list):
+    """
+    EasyOCR result list that carries the `TextIndex` built for it, so the index
+    is built once per OCR pass and shared by every lookup on the frame.
+    """
+
+    _text_index = None
+
+    @property
+    def text_index(self):
+        if self._text_index is None:
+            self._text_index = TextIndex(self)
+        return self._text_index
+
+
+def _element_bounds(element):
+    xs = [point[0] for point in element[0]]
+    ys = [point[1] for point in element[0]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _shift_element(element, dx, dy):
+    box, text, confidence = element
+    return [[x + dx, y + dy] for x, y in box], text, confidence
+
+
+reader_pool = ReaderPool()
+ocr_cache = OCRCache()
+ocr_tiles = TileCache("ocr")
+
+
+def read_screenshot_text(frame, languages=("en",)):
     """
-    Searches for a text element in the OCR results and returns its index. Also draws bounding boxes on the image.
+    Runs EasyOCR on a captured frame, reusing the cached result if the same
+    frame has already been read.
+    Args:
+        frame (Frame): The captured screen.
+        languages (list): EasyOCR language codes, e.g. ["en"].
+
+    Returns:
+        list: The list of results returned by EasyOCR.
+    """
+    key = (frame.digest, ReaderPool._key(languages))
+    result = ocr_cache.get(key)
+    if result is None:
+        with reader_pool.borrow(languages) as reader:
+
+            def run(region):
+                return reader.readtext(region.array)
+
+            if config.grounding_tile_cache:
+                elements = ocr_tiles.analyze(
+                    frame, run, _element_bounds, _shift_element, key=key[1]
+                )
+            else:
+                elements = run(frame)
+            result = OCRResult(elements)
+        # build the search index here too, so grounding is only a lookup
+        result.text_index
+        ocr_cache.put(key, result)
+    elif config.verbose:
+        print("[read_screenshot_text] using cached OCR result")
+    return result
+
+
+def cached_screenshot_text(frame, languages=("en",)):
+    """
+    Returns the OCR result for `frame` if it has already been read, without
+    running OCR.
+    """
+    return ocr_cache.peek((frame.digest, ReaderPool._key(languages)))
+
+
+def draw_ocr_boxes(image, result, found_index):
+    """
+    Returns a copy of `image` with every OCR box in blue and the match in red.
+    """
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    for element in result:
+        draw.polygon([tuple(point) for point in element[0]], outline="blue")
+    draw.polygon([tuple(point) for point in result[found_index][0]], outline="red")
+    return image
+
+
+def get_text_element(result, search_text, frame):
+    """
+    Searches for a text element in the OCR results and returns the index of the best match. Also draws bounding boxes on the image.
     Args:
         result (list): The list of results returned by EasyOCR.
         search_text (str): The text to search for in the OCR results.
-        image_path (str): Path to the original image.
+        frame (Frame): The captured screen the OCR ran on.
 
     Returns:
-        int: The index of the element containing the search text.
+        int: The index of the element best matching the search text.
 
     Raises:
-        Exception: If the text element is not found in the results.
+        GroundingError: If the text element is not found in the results.
     """
     if config.verbose:
         print("[get_text_element]")
         print("[get_text_element] search_text", search_text)
-        # Create /ocr directory if it doesn't exist
-        ocr_dir = "ocr"
-        if not os.path.exists(ocr_dir):
-            os.makedirs(ocr_dir)
 
-        # Open the original image
-        image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
+    if isinstance(result, OCRResult):
+        text_index = result.text_index
+    else:
+        text_index = TextIndex(result)
+    found_index = text_index.best(search_text)
 
-    found_index = None
-    for index, element in enumerate(result):
-        text = element[1]
-        box = element[0]
-
-        if config.verbose:
-            # Draw bounding box in blue
-            draw.polygon([tuple(point) for point in box], outline="blue")
-
-        if search_text in text:
-            found_index = index
-            if config.verbose:
-                print("[get_text_element][loop] found search_text, index:", index)
+    if config.verbose:
+        print("[get_text_element] candidates", text_index.search(search_text))
 
     if found_index is not None:
-        if config.verbose:
-            # Draw bounding box of the found text in red
-            box = result[found_index][0]
-            draw.polygon([tuple(point) for point in box], outline="red")
-            # Save the image with bounding boxes
-            datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-            ocr_image_path = os.path.join(ocr_dir, f"ocr_image_{datetime_str}.png")
-            image.save(ocr_image_path)
-            print("[get_text_element] OCR image saved at:", ocr_image_path)
+        # the matched text in red among all OCR boxes, drawn on the writer thread
+        datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        queued = debug_sink.save(
+            OCR_DIR,
+            f"ocr_image_{datetime_str}.png",
+            lambda: draw_ocr_boxes(frame.image, result, found_index),
+        )
+        if queued and config.verbose:
+            print("[get_text_element] OCR image queued for", OCR_DIR)
 
         return found_index
 
-    raise Exception("The text element was not found in the image")
+    raise GroundingError(search_text, "The text element was not found in the image")
 
 
-def get_text_coordinates(result, index, image_path):
+def get_text_coordinates(result, index, frame):
     """
     Gets the coordinates of the text element at the specified index as a percentage of screen width and height.
     Args:
         result (list): The list of results returned by EasyOCR.
         index (int): The index of the text element in the results list.
-        image_path (str): Path to the screenshot image.
+        frame (Frame): The captured screen the OCR ran on.
 
     Returns:
         dict: A dictionary containing the 'x' and 'y' coordinates as percentages of the screen width and height.
@@ -90,8 +451,7 @@ def get_text_coordinates(result, index, image_path):
     center_y = (min_y + max_y) / 2
 
     # Get image dimensions
-    with Image.open(image_path) as img:
-        width, height = img.size
+    width, height = frame.size
 
     # Convert to percentages
     percent_x = round((center_x / width), 3)
@@ -1,17 +1,27 @@
 import pyautogui
-import platform
 import time
 import math
 
+from operate.config import Config
+from operate.utils.keyboard import typing_engine
 from operate.utils.misc import convert_percent_to_decimal
 
+# Load configuration
+config = Config()
+
+# click-like operations and the pyautogui arguments they map to
+CLICK_OPERATIONS = {
+    "click": {"button": "left", "clicks": 1},
+    "double_click": {"button": "left", "clicks": 2},
+    "right_click": {"button": "right", "clicks": 1},
+}
+
 
 class OperatingSystem:
     def write(self, content):
         try:
             content = content.replace("\\n", "\n")
-            for char in content:
-                pyautogui.write(char)
+            typing_engine.type(content)
         except Exception as e:
             print("[OperatingSystem][write] error:", e)
 
@@ -25,17 +35,24 @@ class OperatingSystem:
         except Exception as e:
             print("[OperatingSystem][press] error:", e)
 
-    def mouse(self, click_detail):
+    def mouse(self, click_detail, button="left", clicks=1):
         try:
             x = convert_percent_to_decimal(click_detail.get("x"))
             y = convert_percent_to_decimal(click_detail.get("y"))
 
             if click_detail and isinstance(x, float) and isinstance(y, float):
-                self.click_at_percentage(x, y)
+                self.click_at_percentage(x, y, button=button, clicks=clicks)
 
         except Exception as e:
             print("[OperatingSystem][mouse] error:", e)
 
+    @staticmethod
+    def to_pixels(x_percentage, y_percentage):
+        screen_width, screen_height = pyautogui.size()
+        x_pixel = int(screen_width * float(x_percentage))
+        y_pixel = int(screen_height * float(y_percentage))
+        return x_pixel, y_pixel
+
     def click_at_percentage(
         self,
         x_percentage,
@@ -43,21 +60,59 @@ class OperatingSystem:
         duration=0.2,
         circle_radius=50,
         circle_duration=0.5,
+        button="left",
+        clicks=1,
+        mode=None,
     ):
         try:
-            screen_width, screen_height = pyautogui.size()
-            x_pixel = int(screen_width * float(x_percentage))
-            y_pixel = int(screen_height * float(y_percentage))
+            x_pixel, y_pixel = self.to_pixels(x_percentage, y_percentage)
 
-            pyautogui.moveTo(x_pixel, y_pixel, duration=duration)
+            if (mode or config.click_mode) == "feedback":
+                # glide to the target and circle it so demo viewers can follow
+                pyautogui.moveTo(x_pixel, y_pixel, duration=duration)
 
-            start_time = time.time()
-            while time.time() - start_time < circle_duration:
-                angle = ((time.time() - start_time) / circle_duration) * 2 * math.pi
-                x = x_pixel + math.cos(angle) * circle_radius
-                y = y_pixel + math.sin(angle) * circle_radius
-                pyautogui.moveTo(x, y, duration=0.1)
+                start_time = time.time()
+                while time.time() - start_time < circle_duration:
+                    angle = ((time.time() - start_time) / circle_duration) * 2 * math.pi
+                    x = x_pixel + math.cos(angle) * circle_radius
+                    y = y_pixel + math.sin(angle) * circle_radius
+                    pyautogui.moveTo(x, y, duration=0.1)
 
-            pyautogui.click(x_pixel, y_pixel)
+            # "direct" mode teleports and clicks without pyautogui's pause
+            pyautogui.click(
+                x_pixel,
+                y_pixel,
+                clicks=clicks,
+                interval=0.05 if clicks > 1 else 0.0,
+                button=button,
+                _pause=False,
+            )
         except Exception as e:
             print("[OperatingSystem][click_at_percentage] error:", e)
+
+    def drag(self, start, end, duration=0.3):
+        try:
+            start_x, start_y = self.to_pixels(start.get("x"), start.get("y"))
+            end_x, end_y = self.to_pixels(end.get("x"), end.get("y"))
+            pyautogui.moveTo(start_x, start_y, _pause=False)
+            # most apps need intermediate motion events to register a drag
+            pyautogui.dragTo(end_x, end_y, duration=duration, button="left", _pause=False)
+        except Exception as e:
+            print("[OperatingSystem][drag] error:", e)
+
+    def scroll(self, direction="down", amount=5, position=None):
+        try:
+            x = y = None
+            if position and position.get("x") is not None:
+                x, y = self.to_pixels(position.get("x"), position.get("y"))
+            amount = int(amount)
+            if direction in ("left", "right"):
+                pyautogui.hscroll(
+                    amount if direction == "right" else -amount, x=x, y=y, _pause=False
+                )
+            else:
+                pyautogui.scroll(
+                    amount if direction == "up" else -amount, x=x, y=y, _pause=False
+                )
+        except Exception as e:
+            print("[OperatingSystem][scroll] error:", e)
@@ -0,0 +1,138 @@
+"""
+Pipelined capture: prepare the next step's frame while the loop moves on.
+
+Once the last operation of a step has run and the screen has settled,
+`CapturePipeline.prefetch` captures the post-action frame in the background
+and starts the per-frame stages the model needs (delta view and encoding, OCR,
+YOLO labels). The next `call_*` then picks up a ready frame with
+`next_frame()` and awaits each stage with `stage()`, which reuses the
+prefetched work instead of running it again.
+
+Every stage is timed, and so is how long the model call had to wait for it,
+so the overlap win shows up in `summary()`.
+"""
+import asyncio
+import time
+
+from operate.config import Config
+from operate.utils.concurrency import run_blocking
+from operate.utils.screenshot import capture_frame
+from operate.utils.settle import wait_for_settle
+
+# Load configuration
+config = Config()
+
+
+class CapturePipeline:
+    """
+    Holds at most one prefetched frame and the stage futures started on it.
+    """
+
+    def __init__(self):
+        self._next = None
+        # (name, repr(args)) -> (frame, future), only for the most recent frame
+        self._stages = {}
+        self.timings = {}
+
+    def _record(self, name, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        self.timings.setdefault(name, []).append(elapsed)
+        if config.verbose:
+            print(f"[CapturePipeline] {name} {elapsed:.1f}ms")
+
+    async def _timed(self, name, fn, *args):
+        started = time.perf_counter()
+        try:
+            return await run_blocking(fn, *args)
+        finally:
+            self._record(name, started)
+
+    async def _prepare(self, stages):
+        frame = await self._timed("capture", capture_frame)
+        for name, fn, args in stages:
+            self.start_stage(name, frame, fn, *args)
+        return frame
+
+    def prefetch(self, stages=()):
+        """
+        Starts capturing the post-action frame, then runs `stages` on it.
+        Must be called on the event loop after the screen has settled.
+        Args:
+            stages (list): `(name, fn, args)` tuples, each run as `fn(frame, *args)`.
+        """
+        self.cancel()
+        self._next = asyncio.ensure_future(self._prepare(stages))
+
+    def cancel(self):
+        if self._next is not None:
+            self._next.cancel()
+            self._next = None
+        for _, future in self._stages.values():
+            future.cancel()
+        self._stages.clear()
+
+    async def next_frame(self):
+        """
+        Returns the prefetched frame, or settles and captures one now.
+        """
+        started = time.perf_counter()
+        if self._next is not None:
+            pending, self._next = self._next, None
+            try:
+                frame = await pending
+                self._record("wait:capture", started)
+                return frame
+            except Exception as e:
+                print("[CapturePipeline][next_frame] prefetch failed:", e)
+
+        await self._timed("settle", wait_for_settle, "capture")
+        frame = await self._timed("capture", capture_frame)
+        self._record("wait:capture", started)
+        return frame
+
+    def start_stage(self, name, frame, fn, *args):
+        key = (name, repr(args))
+        entry = self._stages.get(key)
+        if entry is not None and entry[0] is frame:
+            return entry[1]
+        # results for older frames are never needed again
+        for stale in [k for k, (f, _) in self._stages.items() if f is not frame]:
+            del self._stages[stale]
+        future = asyncio.ensure_future(self._timed(name, fn, frame, *args))
+        self._stages[key] = (frame, future)
+        return future
+
+    def cancel_stage(self, name, frame):
+        """
+        Cancels the `name` stages started on `frame`. A stage still waiting
+        for a worker never runs; one already running finishes unobserved.
+        """
+        for key, (stage_frame, future) in list(self._stages.items()):
+            if key[0] == name and stage_frame is frame:
+                future.cancel()
+                del self._stages[key]
+                if config.verbose:
+                    print(f"[CapturePipeline] cancelled {name}")
+
+    async def stage(self, name, frame, fn, *args):
+        """
+        Awaits `fn(frame, *args)`, reusing the prefetched run for this frame.
+        """
+        started = time.perf_counter()
+        try:
+            return await self.start_stage(name, frame, fn, *args)
+        finally:
+            self._record(f"wait:{name}", started)
+
+    def summary(self):
+        return {
+            name: {
+                "count": len(samples),
+                "mean_ms": round(sum(samples) / len(samples), 1),
+                "max_ms": round(max(samples), 1),
+            }
+            for name, samples in self.timings.items()
+        }
+
+
+capture_pipeline = CapturePipeline()
@@ -1,42 +1,125 @@
+import base64
+import hashlib
+import io
 import os
-import platform
-import subprocess
-import pyautogui
-from PIL import Image, ImageDraw, ImageGrab
-import Xlib.display
-import Xlib.X
-import Xlib.Xutil  # not sure if Xutil is necessary
-
-
-def capture_screen_with_cursor(file_path):
-    user_platform = platform.system()
-
-    if user_platform == "Windows":
-        screenshot = pyautogui.screenshot()
-        screenshot.save(file_path)
-    elif user_platform == "Linux":
-        # Use xlib to prevent scrot dependency for Linux
-        screen = Xlib.display.Display().screen()
-        size = screen.width_in_pixels, screen.height_in_pixels
-        screenshot = ImageGrab.grab(bbox=(0, 0, size[0], size[1]))
-        screenshot.save(file_path)
-    elif user_platform == "Darwin":  # (Mac OS)
-        # Use the screencapture utility to capture the screen with the cursor
-        subprocess.run(["screencapture", "-C", file_path])
-    else:
-        print(f"The platform you're using ({user_platform}) is not currently supported")
-
-
-def compress_screenshot(raw_screenshot_filename, screenshot_filename):
-    with Image.open(raw_screenshot_filename) as img:
-        # Check if the image has an alpha channel (transparency)
-        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-            # Create a white background image
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            # Paste the image onto the background, using the alpha channel as mask
+import time
+from PIL import Image
+
+from operate.config import Config
+from operate.utils.capture import get_capture_backend
+from operate.utils.debug import debug_sink
+
+# Load configuration
+config = Config()
+
+
+class Frame:
+    """
+    A captured screen held in memory.
+
+    Keeps the pixel buffer and its dimensions, and computes encodings (PNG,
+    JPEG, base64), the numpy view and the content digest lazily, once, so
+    compression, OCR, labeling and the API calls all share the same capture
+    instead of re-reading a file from disk.
+    """
+
+    def __init__(self, image, captured_at=None):
+        self.image = image
+        self.width, self.height = image.size
+        self.captured_at = captured_at or time.time()
+        self._encodings = {}
+        self._base64 = {}
+        # uploads produced by `operate.utils.encoder`, keyed by provider
+        self.encoded = {}
+        self._digest = None
+        self._array = None
+        # the `LabelTable` of a SoM-labeled frame
+        self.labels = None
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def digest(self):
+        """Content hash of the raw pixels, used as a cache key."""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(
+                self.image.tobytes(), digest_size=16
+            ).digest()
+        return self._digest
+
+    @property
+    def array(self):
+        """RGB numpy view of the frame, as consumed by EasyOCR and YOLO."""
+        if self._array is None:
+            import numpy as np
+
+            self._array = np.asarray(self.rgb())
+        return self._array
+
+    def rgb(self):
+        """
+        Returns the frame as an RGB image, flattening any alpha channel onto a
+        white background.
+        """
+        img = self.image
+        if img.mode in ("RGBA", "LA") or (
+            img.mode == "P" and "transparency" in img.info
+        ):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
             background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-            # Save the result as JPEG
-            background.save(screenshot_filename, 'JPEG', quality=85)  # Adjust quality as needed
-        else:
-            # If no alpha channel, simply convert and save
-            img.convert('RGB').save(screenshot_filename, 'JPEG', quality=85)
+            return background
+        if img.mode != "RGB":
+            return img.convert("RGB")
+        return img
+
+    def encode(self, format="PNG", **params):
+        """
+        Returns the frame encoded as `format`, computed once per format and
+        encoder parameters.
+        """
+        key = (format.upper(), tuple(sorted(params.items())))
+        if key not in self._encodings:
+            img = self.image if key[0] == "PNG" else self.rgb()
+            buffer = io.BytesIO()
+            img.save(buffer, format=key[0], **params)
+            self._encodings[key] = buffer.getvalue()
+        return self._encodings[key]
+
+    def base64(self, format="PNG", **params):
+        key = (format.upper(), tuple(sorted(params.items())))
+        if key not in self._base64:
+            self._base64[key] = base64.b64encode(
+                self.encode(format, **params)
+            ).decode("utf-8")
+        return self._base64[key]
+
+    def save(self, file_path):
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.image.save(file_path)
+
+
+def capture_frame():
+    """
+    Captures the screen into an in-memory `Frame` using the session's capture
+    backend (see `operate.utils.capture`).
+    """
+    frame = Frame(get_capture_backend().grab())
+    save_debug_frame(frame)
+    return frame
+
+
+def save_debug_frame(frame, file_name="screenshot.png"):
+    """
+    Queues `frame` to be written to the `screenshots` directory when
+    screenshot saving is enabled (`SAVE_SCREENSHOTS=1`). Nothing is written
+    otherwise.
+    """
+    if not config.save_screenshots:
+        return None
+    debug_sink.submit("screenshots", file_name, frame.image, retain=False)
+    return os.path.join("screenshots", file_name)
@@ -0,0 +1,128 @@
+"""
+"Screen settled" detection, replacing fixed sleeps between actions.
+
+`wait_for_settle` polls cheap low-resolution hashes of the screen until enough
+consecutive hashes match or the operation's timeout is reached, and records
+how long each wait took.
+"""
+import hashlib
+import time
+
+from operate.config import Config
+from operate.utils.capture import get_capture_backend
+
+# Load configuration
+config = Config()
+
+# operation type -> (minimum wait, timeout) in seconds
+SETTLE_PROFILES = {
+    "click": (0.05, 2.0),
+    "double_click": (0.05, 2.0),
+    "right_click": (0.05, 1.0),  # context menus render quickly
+    "drag": (0.05, 2.0),
+    "scroll": (0.05, 1.0),
+    "write": (0.0, 1.0),
+    "press": (0.05, 3.0),  # hotkeys often open apps or switch windows
+    "capture": (0.0, 1.0),
+    "default": (0.05, 2.0),
+}
+
+# downscale factor and grey-level quantization for the settle hash, coarse
+# enough that a blinking caret does not count as a change
+THUMBNAIL_REDUCE = 16
+QUANTIZE_SHIFT = 4
+
+
+class SettleMetrics:
+    """
+    Per operation type wait statistics, printed in verbose mode.
+    """
+
+    def __init__(self):
+        self.waits = {}
+
+    def record(self, operation_type, elapsed, polls, settled):
+        stats = self.waits.setdefault(
+            operation_type, {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0}
+        )
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        if not settled:
+            stats["timeouts"] += 1
+        if config.verbose:
+            print(
+                f"[wait_for_settle] {operation_type} "
+                f"{'settled' if settled else 'timed out'} after {elapsed * 1000:.0f}ms "
+                f"({polls} polls)"
+            )
+
+    def summary(self):
+        return {
+            operation_type: dict(stats, mean=stats["total"] / stats["count"])
+            for operation_type, stats in self.waits.items()
+        }
+
+
+settle_metrics = SettleMetrics()
+
+
+def screen_hash():
+    """
+    Hash of a coarse greyscale thumbnail of the screen.
+    """
+    thumbnail = get_capture_backend().thumbnail(THUMBNAIL_REDUCE)
+    quantized = thumbnail.point(lambda value: value >> QUANTIZE_SHIFT)
+    return hashlib.blake2b(quantized.tobytes(), digest_size=8).digest()
+
+
+def wait_for_settle(operation_type="default"):
+    """
+    Blocks until the screen stops changing after `operation_type`.
+    Args:
+        operation_type (str): A key of `SETTLE_PROFILES`, e.g. "click".
+
+    Returns:
+        bool: True if the screen settled, False on timeout.
+    """
+    if config.settle_mode == "sleep":
+        # legacy fixed pacing
+        time.sleep(1)
+        return True
+
+    min_wait, timeout = SETTLE_PROFILES.get(
+        operation_type, SETTLE_PROFILES["default"]
+    )
+    timeout *= config.settle_timeout_scale
+    start = time.perf_counter()
+    if min_wait:
+        time.sleep(min_wait)
+
+    polls = 0
+    stable = 0
+    previous = None
+    settled = False
+    try:
+        poll_interval = max(
+            config.settle_poll_interval, get_capture_backend().min_poll_interval
+        )
+        while True:
+            current = screen_hash()
+            polls += 1
+            stable = stable + 1 if current == previous else 0
+            previous = current
+            if stable >= config.settle_stable_polls:
+                settled = True
+                break
+            if time.perf_counter() - start >= timeout:
+                break
+            time.sleep(poll_interval)
+    except Exception as e:
+        # never block an action on a failing capture, fall back to fixed pacing
+        print("[wait_for_settle] error:", e)
+        time.sleep(1)
+
+    settle_metrics.record(
+        operation_type, time.perf_counter() - start, polls, settled
+    )
+    return settled
@@ -0,0 +1,55 @@
+"""
+`operate --profile-startup`: import-time breakdown of a cold start.
+
+Runs the imports `operate -m <model>` performs in a fresh interpreter under
+`python -X importtime` and totals the self time per top-level package, and
+per module for `operate` itself.
+"""
+import subprocess
+import sys
+import time
+
+STARTUP_CODE = (
+    "import operate.operate\n"
+    "from operate.models.providers import get_provider, warm_up\n"
+    "get_provider({model!r}).load()\n"
+    "warm_up({model!r})\n"
+)
+
+
+def parse_importtime(stderr):
+    """
+    Returns `{package: self time in microseconds}` from `-X importtime` output.
+    """
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:") :].split("|")
+            name = name.strip()
+            # our own modules individually, everything else per package
+            package = name if name.startswith("operate") else name.split(".")[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+        except ValueError:
+            continue
+    return totals
+
+
+def profile_startup(model, top=15):
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE.format(model=model)],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        print(process.stderr.strip().splitlines()[-1])
+        return
+
+    totals = parse_importtime(process.stderr)
+    imported = sum(totals.values()) / 1e6
+    print(f"Startup imports for -m {model}: {imported:.3f}s ({wall:.3f}s wall)")
+    for package, micros in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<28} {micros / 1000:9.1f}ms {micros / 1e4 / imported:5.1f}%")
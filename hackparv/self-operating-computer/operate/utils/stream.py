@@ -0,0 +1,146 @@
+"""
+Incremental parsing of a streamed operations array.
+
+Models answer with a JSON array of operation objects, often wrapped in a
+Markdown fence or an `{"operations": [...]}` object. `OperationStreamParser`
+is fed the response text as it streams in and returns each top-level object
+of the operations array as soon as its closing brace arrives, so the first
+operation can run while the model is still writing the rest.
+
+Only a top-level array, or the `operations` array of a top-level object, is
+the operations array. A response that is a single operation object never
+starts one, `ended` is set when it closes and the caller parses it whole.
+"""
+import json
+
+from operate.exceptions import ResponseParseError
+from operate.utils.json_repair import repair_json
+
+
+class OperationStreamParser:
+    """
+    Scans streamed text once, tracking nesting and strings, and decodes each
+    complete object in the operations array of the response.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.operations = []
+        # the JSON text of each decoded operation
+        self.sources = []
+        # objects that only decoded after `repair_json`
+        self.repaired = 0
+        # the array was opened / closed
+        self.started = False
+        self.done = False
+        # the first top-level object closed without an operations array
+        self.ended = False
+        self._pos = 0
+        # nesting before the array starts, and the last key at the top level
+        self._outer_depth = 0
+        self._string_start = None
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_start = None
+        self._object_start = None
+
+    @property
+    def array_text(self):
+        """
+        The complete array text once `done`, else None.
+        """
+        if not self.done:
+            return None
+        return self.text[self._array_start : self._pos]
+
+    def feed(self, chunk):
+        """
+        Adds `chunk` to the response and returns the operations it completed.
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._pos < len(text) and not (self.done or self.ended):
+            index = self._pos
+            char = text[index]
+            self._pos += 1
+            if not self.started:
+                # skip fences and wrappers up to the array
+                self._find_array(index, char)
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "{" and self._depth == 1:
+                    self._object_start = index
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                elif self._depth == 1 and self._object_start is not None:
+                    source = text[self._object_start : index + 1]
+                    operation, source = self._decode(source)
+                    completed.append(operation)
+                    self.sources.append(source)
+                    self._object_start = None
+        self.operations.extend(completed)
+        return completed
+
+    def _find_array(self, index, char):
+        """
+        Advances over the text before the operations array: prose and fences
+        outside any value, or the top-level object up to its `operations`
+        key. Arrays nested anywhere else, like the `keys` of a single
+        operation object, are skipped.
+        """
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._outer_depth == 1:
+                    self._key = self.text[self._string_start + 1 : index]
+            return
+        if char == "[" and (
+            self._outer_depth == 0
+            or (self._outer_depth == 1 and self._key == "operations")
+        ):
+            self.started = True
+            self._array_start = index
+            self._depth = 1
+        elif char == '"' and self._outer_depth:
+            # quotes in prose around the JSON are not strings
+            self._in_string = True
+            self._string_start = index
+        elif char in "[{":
+            self._outer_depth += 1
+        elif char in "]}" and self._outer_depth:
+            self._outer_depth -= 1
+            if self._outer_depth == 0:
+                self.ended = True
+
+    def _decode(self, text):
+        try:
+            return json.loads(text), text
+        except json.JSONDecodeError as e:
+            error = e
+        repaired = repair_json(text)
+        try:
+            operation = json.loads(repaired)
+        except json.JSONDecodeError:
+            raise ResponseParseError(text, str(error)) from error
+        self.repaired += 1
+        return operation, repaired
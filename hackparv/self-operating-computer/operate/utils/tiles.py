@@ -0,0 +1,242 @@
+"""
+Tile-level grounding cache: re-analyze only what changed on screen.
+
+Consecutive screenshots are mostly identical, yet OCR and YOLO used to run on
+the whole frame every step. `TileCache` splits each frame into fixed tiles and
+hashes them. Against the tile hashes of the frame its cached result came
+from, it finds the dirty tiles, groups them into regions and reruns the
+analysis on those regions only. The fresh elements are shifted to global
+coordinates and merged with the cached elements outside the regions, so the
+cost of a step follows how much of the screen changed, not its resolution.
+
+Elements are opaque to the cache; the caller passes how to get an element's
+bounding box and how to shift it by an offset.
+"""
+import hashlib
+import threading
+
+from operate.config import Config
+from operate.utils.screenshot import Frame
+
+# Load configuration
+config = Config()
+
+# regions are grown to at least this many pixels a side, so the detector
+# still sees some context around a small change
+MIN_REGION_SIZE = 128
+
+
+def tile_hashes(array, tile):
+    """
+    Returns a `(rows, cols)` uint64 array with a hash of each `tile`-sized
+    tile of an `(height, width, channels)` image array.
+    """
+    import numpy as np
+
+    height, width = array.shape[:2]
+    rows = -(-height // tile)
+    cols = -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile) + array.shape[2:], dtype=array.dtype)
+    padded[:height, :width] = array
+    # one copy that lays every tile out contiguously
+    tiles = padded.reshape(rows, tile, cols, tile, -1).swapaxes(1, 2).reshape(
+        rows * cols, -1
+    )
+    hashes = [
+        hashlib.blake2b(row.tobytes(), digest_size=8).digest() for row in tiles
+    ]
+    hashes = [int.from_bytes(digest, "little") for digest in hashes]
+    return np.array(hashes, dtype=np.uint64).reshape(rows, cols)
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def merge_rects(rects):
+    """
+    Merges overlapping rectangles until none overlap.
+    """
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if _intersects(rects[i], rects[j]):
+                    rects[i] = _union(rects[i], rects.pop(j))
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+def dirty_regions(dirty, tile, size):
+    """
+    Groups the dirty tiles of a `(rows, cols)` bool array into 8-connected
+    components and returns their pixel rectangles, grown by one tile and to
+    `MIN_REGION_SIZE`, clipped to `size` and merged where they overlap.
+    """
+    width, height = size
+    rows, cols = dirty.shape
+    seen = set()
+    rects = []
+    for start in zip(*dirty.nonzero()):
+        start = (int(start[0]), int(start[1]))
+        if start in seen:
+            continue
+        seen.add(start)
+        stack = [start]
+        top, left, bottom, right = start[0], start[1], start[0], start[1]
+        while stack:
+            row, col = stack.pop()
+            top, bottom = min(top, row), max(bottom, row)
+            left, right = min(left, col), max(right, col)
+            for d_row in (-1, 0, 1):
+                for d_col in (-1, 0, 1):
+                    neighbour = (row + d_row, col + d_col)
+                    if (
+                        0 <= neighbour[0] < rows
+                        and 0 <= neighbour[1] < cols
+                        and neighbour not in seen
+                        and dirty[neighbour]
+                    ):
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+        # one tile of margin on every side
+        box = [
+            (left - 1) * tile,
+            (top - 1) * tile,
+            (right + 2) * tile,
+            (bottom + 2) * tile,
+        ]
+        for axis, limit in ((0, width), (1, height)):
+            lo, hi = box[axis], box[axis + 2]
+            side = min(max(MIN_REGION_SIZE, hi - lo), limit)
+            lo = min(max(0, (lo + hi - side) // 2), limit - side)
+            box[axis], box[axis + 2] = lo, lo + side
+        rects.append(tuple(box))
+    return merge_rects(rects)
+
+
+# every TileCache by name, for the session summary
+tile_caches = {}
+
+
+class _Entry:
+    def __init__(self, size, tile, hashes, elements):
+        self.size = size
+        self.tile = tile
+        self.hashes = hashes
+        self.elements = elements
+
+
+class TileCache:
+    """
+    One analysis (OCR, YOLO) cached per key, as the elements found in the last
+    analyzed frame and that frame's tile hashes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = {}
+        tile_caches[name] = self
+        self.stats = {
+            "full": 0,
+            "partial": 0,
+            "reused": 0,
+            "tiles": 0,
+            "dirty_tiles": 0,
+            "pixels": 0,
+            "analyzed_pixels": 0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def analyze(self, frame, run, bounds, shift, key=None):
+        """
+        Returns the elements in `frame`, from cache where its tiles are
+        unchanged.
+        Args:
+            frame (Frame): The captured screen.
+            run (callable): `run(frame)` analyzes a `Frame` (the whole screen
+                or a crop of it) and returns elements in its coordinates.
+            bounds (callable): `bounds(element)` is its `(x1, y1, x2, y2)` box.
+            shift (callable): `shift(element, dx, dy)` moves it by an offset.
+            key: Separates analyses with different settings, e.g. languages.
+        """
+        tile = max(8, config.grounding_tile_size)
+        hashes = tile_hashes(frame.array, tile)
+        with self._lock:
+            entry = self._entries.get(key)
+        self.stats["tiles"] += hashes.size
+        self.stats["pixels"] += frame.width * frame.height
+
+        dirty = None
+        if entry is not None and entry.size == frame.size and entry.tile == tile:
+            dirty = hashes != entry.hashes
+            self.stats["dirty_tiles"] += int(dirty.sum())
+
+        if dirty is None or dirty.mean() > config.grounding_max_dirty:
+            elements = list(run(frame))
+            self.stats["full"] += 1
+            self.stats["analyzed_pixels"] += frame.width * frame.height
+        elif not dirty.any():
+            elements = list(entry.elements)
+            self.stats["reused"] += 1
+        else:
+            elements = self._update(frame, entry, dirty, tile, run, bounds, shift)
+            self.stats["partial"] += 1
+
+        with self._lock:
+            self._entries[key] = _Entry(frame.size, tile, hashes, elements)
+        if config.verbose:
+            print(f"[TileCache] {self.name}", self.summary())
+        return list(elements)
+
+    def _update(self, frame, entry, dirty, tile, run, bounds, shift):
+        regions = dirty_regions(dirty, tile, frame.size)
+        # grow each region over the cached elements it cuts, so they are read
+        # again whole rather than as fragments
+        for _ in range(3):
+            grown = []
+            for region in regions:
+                for element in entry.elements:
+                    box = bounds(element)
+                    if _intersects(box, region):
+                        region = _union(region, tuple(int(v) for v in box))
+                grown.append(region)
+            grown = merge_rects(grown)
+            if grown == regions:
+                break
+            regions = grown
+
+        kept = [
+            element
+            for element in entry.elements
+            if not any(_intersects(bounds(element), region) for region in regions)
+        ]
+        fresh = []
+        for x1, y1, x2, y2 in regions:
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(frame.width, x2), min(frame.height, y2)
+            crop = Frame(frame.image.crop((x1, y1, x2, y2)), frame.captured_at)
+            fresh.extend(shift(element, x1, y1) for element in run(crop))
+            self.stats["analyzed_pixels"] += (x2 - x1) * (y2 - y1)
+        return kept + fresh
+
+    def summary(self):
+        stats = dict(self.stats)
+        if stats["pixels"]:
+            stats["analyzed_ratio"] = round(
+                stats["analyzed_pixels"] / stats["pixels"], 3
+            )
+        return stats
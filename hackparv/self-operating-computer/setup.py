@@ -20,7 +20,7 @@ setup(
     },
     package_data={
         # Include the file in the operate.models.weights package
-        "operate.models.weights": ["best.pt"],
+        "operate.models.weights": ["best.pt", "best.onnx", "best.torchscript"],
     },
     long_description=long_description,  # Add project description here
     long_description_content_type="text/markdown",  # Specify Markdown format
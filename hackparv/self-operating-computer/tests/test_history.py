@@ -0,0 +1,108 @@
+import types
+
+import pytest
+
+from operate.utils.history import ConversationHistory, config
+from operate.utils.ocr import ReaderPool, ocr_cache
+
+
+@pytest.fixture(autouse=True)
+def budgets(monkeypatch):
+    monkeypatch.setattr(config, "history_max_images", 2)
+    monkeypatch.setattr(config, "history_max_bytes", 0)
+    monkeypatch.setattr(config, "history_max_tokens", 0)
+    yield
+    ocr_cache.clear()
+
+
+def frame(step):
+    return types.SimpleNamespace(digest=f"frame-{step}".encode(), size=(100, 100))
+
+
+def user_message(image="x" * 1000):
+    return {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "next action"},
+            {"type": "image_url", "image_url": {"url": image}},
+        ],
+    }
+
+
+def image_count(messages):
+    return sum(
+        1
+        for message in messages
+        if isinstance(message["content"], list)
+        and any(part["type"] == "image_url" for part in message["content"])
+    )
+
+
+def run_steps(history, messages, steps, ocr_text=None):
+    for step in range(1, steps + 1):
+        current = frame(step)
+        history.append(messages, user_message(), current)
+        if ocr_text:
+            key = (current.digest, ReaderPool._key(["en"]))
+            ocr_cache.put(key, [[[[0, 0]], f"{ocr_text} {step}", 0.9]])
+        messages.append({"role": "assistant", "content": "[]"})
+
+
+def test_old_screenshots_become_summaries():
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    run_steps(history, messages, 4)
+    assert image_count(messages) == 2
+    assert messages[1]["content"][-1]["text"] == (
+        "[Screenshot from step 1 removed to save space.]"
+    )
+
+
+def test_summary_keeps_the_ocr_text():
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    run_steps(history, messages, 3, ocr_text="Inbox")
+    assert "Text visible on that screen: Inbox 1" in messages[1]["content"][-1]["text"]
+
+
+def test_capture_text_before_eviction():
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    current = frame(1)
+    history.append(messages, user_message(), current)
+    key = (current.digest, ReaderPool._key(["en"]))
+    ocr_cache.put(key, [[[[0, 0]], "Inbox", 0.9]])
+    history.capture_text(current, ["en"])
+    ocr_cache.clear()
+    run_steps(history, messages, 2)
+    assert "Inbox" in messages[1]["content"][-1]["text"]
+
+
+def test_the_new_screenshot_is_always_kept(monkeypatch):
+    monkeypatch.setattr(config, "history_max_images", 0)
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    run_steps(history, messages, 2)
+    assert image_count(messages) == 1
+    assert image_count(messages[-2:]) == 1
+
+
+def test_trim_drops_the_oldest_turns(monkeypatch):
+    monkeypatch.setattr(config, "history_max_images", 10)
+    monkeypatch.setattr(config, "history_max_bytes", 2500)
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    run_steps(history, messages, 4)
+    assert messages[0]["role"] == "system"
+    assert len(messages) == 5
+    assert history.payloads[-1]["bytes"] <= 2500
+
+
+def test_discard_forgets_the_screenshot():
+    history = ConversationHistory()
+    messages = [{"role": "system", "content": "system"}]
+    message = user_message()
+    history.append(messages, message, frame(1))
+    messages.pop()
+    history.discard(message)
+    assert history._screenshots == {}
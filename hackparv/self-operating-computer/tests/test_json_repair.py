@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from operate.utils.json_repair import repair_json
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (
+            '[{"operation": "done", "summary": "ok"},]',
+            [{"operation": "done", "summary": "ok"}],
+        ),
+        ("[{'operation': 'done'}]", [{"operation": "done"}]),
+        ('[{"a": True, "b": False, "c": None}]', [{"a": True, "b": False, "c": None}]),
+        ('[{"content": "line one\nline two"}]', [{"content": "line one\nline two"}]),
+        ("[{'content': 'it\\'s \"fine\"'}]", [{"content": 'it\'s "fine"'}]),
+        ('Sure!\n```json\n[{"a": 1}]\n```', [{"a": 1}]),
+        ('[{"a": 1} {"b": 2}]', [{"a": 1}, {"b": 2}]),
+        (
+            '{"operation": "write", "content": "hel',
+            {"operation": "write", "content": "hel"},
+        ),
+        ('[{"keys": ["ctrl", "t"', [{"keys": ["ctrl", "t"]}]),
+    ],
+)
+def test_repair(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_valid_json_is_unchanged():
+    text = '[{"operation": "click", "x": "0.10", "y": "0.20"}]'
+    assert repair_json(text) == text
+
+
+def test_text_without_json():
+    assert repair_json("no operations here") == "no operations here"
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from operate.utils.label import (
+    BoxGrid,
+    LabelTable,
+    is_overlapping,
+    suppress_overlapping,
+)
+
+
+def naive_suppression(boxes):
+    kept = []
+    for index, box in enumerate(boxes):
+        if not any(is_overlapping(box, boxes[other]) for other in kept):
+            kept.append(index)
+    return kept
+
+
+def random_boxes(count, seed):
+    rng = np.random.default_rng(seed)
+    corners = rng.uniform(0, 1920, size=(count, 2))
+    sizes = rng.uniform(4, 120, size=(count, 2))
+    return np.hstack([corners, corners + sizes])
+
+
+@pytest.mark.parametrize("count", [0, 1, 50, 300])
+def test_matches_pairwise_greedy(count):
+    boxes = random_boxes(count, seed=count)
+    keep = suppress_overlapping(boxes)
+    assert np.flatnonzero(keep).tolist() == naive_suppression(boxes.tolist())
+
+
+def test_grid_matches_matrix():
+    boxes = random_boxes(400, seed=7)
+    assert (BoxGrid.suppress(boxes) == suppress_overlapping(boxes)).all()
+
+
+def test_touching_boxes_overlap():
+    boxes = np.array([[0, 0, 10, 10], [10, 10, 20, 20], [21, 21, 30, 30]], float)
+    assert suppress_overlapping(boxes).tolist() == [True, False, True]
+
+
+def test_label_table():
+    table = LabelTable([[0, 0, 100, 50], [100, 50, 200, 150]], (200, 100))
+    assert len(table) == 2
+    assert table.index("~1") == table.index("1") == table.index(1) == 1
+    assert table.index("~2") is None and table.index("button") is None
+    assert table.get("~0") == (0.0, 0.0, 100.0, 50.0)
+    assert table.get("~5", "missing") == "missing"
+    assert table.center("~1") == (0.75, 1.0)
+    assert table.center("~9") is None
+    assert table.hint() == (
+        "Label centers (x,y as a fraction of the screen): ~0:0.25,0.25 ~1:0.75,1"
+    )
+
+
+def test_empty_label_table():
+    table = LabelTable([], (200, 100))
+    assert len(table) == 0
+    assert table.center("~0") is None
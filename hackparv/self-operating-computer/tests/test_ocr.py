@@ -0,0 +1,94 @@
+import threading
+
+from operate.utils.ocr import OCRResult, ReaderPool, TextIndex
+
+
+class FlakyPool(ReaderPool):
+    def __init__(self, size, fail_after):
+        super().__init__(size)
+        self.loaded = 0
+        self.fail_after = fail_after
+
+    def _create(self, key):
+        if self.loaded >= self.fail_after:
+            raise OSError("out of memory")
+        self.loaded += 1
+        return object()
+
+
+def test_borrow_reuses_readers():
+    pool = FlakyPool(size=1, fail_after=10)
+    with pool.borrow(["en"]) as first:
+        pass
+    with pool.borrow(["en"]) as second:
+        pass
+    assert first is second
+    assert pool.loaded == 1
+
+
+def test_borrow_waits_for_a_free_reader():
+    pool = FlakyPool(size=1, fail_after=10)
+    errors = []
+
+    def acquire():
+        try:
+            pool._acquire(pool._key(["en"]), timeout=0.05)
+        except TimeoutError as e:
+            errors.append(e)
+
+    with pool.borrow(["en"]):
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+
+
+def test_warm_up_releases_readers_when_a_load_fails():
+    pool = FlakyPool(size=2, fail_after=1)
+    pool.warm_up(["en"], count=2)
+    # the reader that loaded is idle and the failed slot was given back
+    assert len(pool._idle[("en",)]) == 1
+    assert pool._created[("en",)] == 1
+    with pool.borrow(["en"], timeout=0.1):
+        pass
+
+
+def element(text, confidence=0.9, box=((0, 0), (10, 0), (10, 10), (0, 10))):
+    return [list(map(list, box)), text, confidence]
+
+
+def test_text_index_tiers():
+    index = TextIndex(
+        [
+            element("Search Google or type a URL"),
+            element("Search"),
+            element("Settings"),
+            element("Sign  in"),
+        ]
+    )
+    assert index.best("search") == 1
+    assert index.best("google") == 0
+    assert index.best("SIGN IN") == 3
+    assert index.best("type URL") == 0
+    assert index.best("Setings") == 2
+    assert index.best("Downloads") is None
+    assert index.best("  ") is None
+
+
+def test_text_index_ties_prefer_confidence_then_area_then_position():
+    small = ((0, 0), (5, 0), (5, 5), (0, 5))
+    index = TextIndex(
+        [
+            element("OK", 0.5),
+            element("OK", 0.9, small),
+            element("OK", 0.9),
+            element("OK", 0.9),
+        ]
+    )
+    assert [match[1] for match in index.search("ok")] == [2, 3, 1, 0]
+
+
+def test_ocr_result_builds_its_index_once():
+    result = OCRResult([element("Submit")])
+    assert result.text_index is result.text_index
+    assert result.text_index.best("submit") == 0
@@ -0,0 +1,120 @@
+import asyncio
+import types
+
+import pytest
+
+from operate.exceptions import GroundingError, ModelNotRecognizedException
+from operate.models import apis
+from operate.models.providers import (
+    OCR_MODELS,
+    PROVIDERS,
+    config,
+    get_prefetch_stages,
+    get_provider,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(config, "retry_max_attempts", 3)
+    monkeypatch.setattr(config, "retry_base_delay", 0.0)
+    monkeypatch.setattr(config, "retry_max_delay", 0.0)
+    apis.retry_policy.breakers.clear()
+
+
+def test_registry():
+    assert get_provider("gpt-4").name == "gpt-4"
+    assert set(OCR_MODELS) >= {"gpt-4-with-ocr", "claude-3", "qwen-vl"}
+    with pytest.raises(ModelNotRecognizedException):
+        get_provider("gpt-2")
+    for name, spec in PROVIDERS.items():
+        assert spec.fallback is None or spec.fallback in PROVIDERS, name
+        assert spec.handler or spec.api in apis.APIS, name
+
+
+def test_pipeline_models_load_call_provider():
+    assert get_provider("gpt-4-with-ocr").load() is apis.call_provider
+
+
+def test_prefetch_stages(monkeypatch):
+    monkeypatch.setattr(config, "ocr_concurrent", True)
+    assert [name for name, _, _ in get_prefetch_stages("gpt-4-with-ocr")] == [
+        "upload",
+        "ocr",
+    ]
+    assert [name for name, _, _ in get_prefetch_stages("gpt-4")] == ["upload"]
+    assert get_prefetch_stages("assistant") == []
+    monkeypatch.setattr(config, "ocr_concurrent", False)
+    assert [name for name, _, _ in get_prefetch_stages("gpt-4-with-ocr")] == ["upload"]
+
+
+def fake_attempts(monkeypatch, errors):
+    """Fails each model with its error, the others return one operation."""
+    calls = []
+
+    async def attempt(messages, objective, model, spec, api, dispatch=None):
+        calls.append(model)
+        if model in errors:
+            raise errors[model]
+        return [{"operation": "done", "summary": model}]
+
+    monkeypatch.setattr(apis, "attempt_provider", attempt)
+    return calls
+
+
+def call(model):
+    return asyncio.run(apis.call_provider([{"role": "system"}], "objective", model))
+
+
+def test_grounding_miss_falls_back_at_once(monkeypatch):
+    error = GroundingError("nothing to click", "not found")
+    calls = fake_attempts(monkeypatch, {"gpt-4-with-ocr": error})
+    assert call("gpt-4-with-ocr")[0]["summary"] == "gpt-4"
+    assert calls == ["gpt-4-with-ocr", "gpt-4"]
+
+
+def test_outage_retries_then_falls_back(monkeypatch):
+    calls = fake_attempts(monkeypatch, {"gpt-4-with-ocr": TimeoutError()})
+    assert call("gpt-4-with-ocr")[0]["summary"] == "gpt-4"
+    assert calls == ["gpt-4-with-ocr"] * 3 + ["gpt-4"]
+
+
+def test_fatal_errors_do_not_fall_back(monkeypatch):
+    calls = fake_attempts(monkeypatch, {"gpt-4-with-ocr": KeyError("content")})
+    with pytest.raises(KeyError):
+        call("gpt-4-with-ocr")
+    assert calls == ["gpt-4-with-ocr"]
+
+
+def test_grounding_targets():
+    drag = {"operation": "drag", "text": "a.txt", "to_text": "Trash"}
+    assert apis.grounding_targets(drag, "ocr") == [
+        ("a.txt", "x", "y"),
+        ("Trash", "to_x", "to_y"),
+    ]
+    assert apis.grounding_targets({"operation": "scroll"}, "som") == []
+    assert apis.grounding_targets({"operation": "click", "x": 0.1}, "coordinates") == []
+
+
+def test_ground_som_operations():
+    labels = types.SimpleNamespace(
+        center=lambda label: {"~1": (0.1, 0.2), "~2": (0.3, 0.4)}.get(label)
+    )
+    upload = types.SimpleNamespace(
+        view=types.SimpleNamespace(map_operations=lambda operations: operations),
+        labels=labels,
+    )
+    spec = types.SimpleNamespace(grounding="som")
+    operations = [
+        {"operation": "drag", "label": "~1", "to_label": "~2"},
+        {"operation": "write", "content": "hi"},
+    ]
+    grounded = asyncio.run(apis.ground_operations(spec, None, upload, operations))
+    assert grounded[0]["x"] == "0.10" and grounded[0]["to_y"] == "0.40"
+    assert "x" not in grounded[1]
+    with pytest.raises(GroundingError):
+        asyncio.run(
+            apis.ground_operations(
+                spec, None, upload, [{"operation": "click", "label": "~7"}]
+            )
+        )
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from operate.exceptions import CircuitOpenError, GroundingError, ResponseParseError
+from operate.models.retry import RetryPolicy, classify, config, retry_after
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(config, "retry_max_attempts", 3)
+    monkeypatch.setattr(config, "retry_base_delay", 0.0)
+    monkeypatch.setattr(config, "retry_max_delay", 0.0)
+    monkeypatch.setattr(config, "circuit_failure_threshold", 2)
+    monkeypatch.setattr(config, "circuit_reset_timeout", 60)
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (StatusError(429), "retryable"),
+        (StatusError(503), "retryable"),
+        (StatusError(401), "fatal"),
+        (StatusError(400), "fatal"),
+        (APIConnectionError(), "retryable"),
+        (TimeoutError(), "retryable"),
+        (ResponseParseError("[", "bad"), "parse"),
+        (GroundingError("nothing to click", "missing"), "grounding"),
+        (KeyError("x"), "fatal"),
+        (TypeError("x"), "fatal"),
+    ],
+)
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_classify_fatal_errors():
+    assert classify(TimeoutError(), fatal_errors=(TimeoutError,)) == "fatal"
+
+
+def test_retry_after():
+    assert retry_after(StatusError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after(StatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(StatusError(429)) is None
+
+
+def failing(errors):
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return attempt, calls
+
+
+def test_retries_until_success():
+    attempt, calls = failing([StatusError(503), ResponseParseError("[", "bad")])
+    assert asyncio.run(RetryPolicy().call("p", attempt)) == "ok"
+    assert len(calls) == 3
+
+
+def test_fatal_is_not_retried():
+    attempt, calls = failing([KeyError("x")])
+    with pytest.raises(KeyError):
+        asyncio.run(RetryPolicy().call("p", attempt))
+    assert len(calls) == 1
+
+
+def test_final_kinds_raise_on_first_occurrence():
+    attempt, calls = failing([GroundingError("nothing to click", "missing")])
+    with pytest.raises(GroundingError):
+        asyncio.run(RetryPolicy().call("p", attempt, final_kinds=("grounding",)))
+    assert len(calls) == 1
+
+
+def test_circuit_opens_after_consecutive_failures():
+    policy = RetryPolicy()
+    attempt, calls = failing([StatusError(503)] * 5)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call("p", attempt))
+    # the third attempt found the breaker open and never ran
+    assert len(calls) == 2
+    assert policy.breaker("p").state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call("p", attempt))
+    assert len(calls) == 2
+
+
+def test_parse_errors_leave_the_circuit_closed():
+    policy = RetryPolicy()
+    attempt, _ = failing([ResponseParseError("[", "bad")] * 2)
+    assert asyncio.run(policy.call("p", attempt)) == "ok"
+    assert policy.breaker("p").state == "closed"
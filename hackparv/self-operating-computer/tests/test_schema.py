@@ -0,0 +1,72 @@
+import pytest
+
+from operate.exceptions import ResponseParseError
+from operate.models.schema import (
+    ParseStats,
+    operations_schema,
+    response_schema,
+    validate_operation,
+    validate_operations,
+)
+
+
+def test_list_single_object_and_wrapper():
+    press = {"operation": "press", "keys": ["enter"]}
+    assert validate_operations([press], "coordinates") == [press]
+    assert validate_operations(press, "coordinates") == [press]
+    assert validate_operations({"operations": [press]}, "coordinates") == [press]
+
+
+def test_defaults_and_normalization():
+    assert validate_operation({"operation": "Hotkey", "keys": "enter"}, "ocr") == {
+        "operation": "hotkey",
+        "keys": ["enter"],
+    }
+    scroll = validate_operation({"operation": "scroll", "text": None}, "ocr")
+    assert scroll == {"operation": "scroll", "direction": "down", "amount": 5}
+
+
+@pytest.mark.parametrize(
+    "done", [{"operation": "done"}, {"operation": "done", "summary": None}]
+)
+def test_done_without_summary(done):
+    assert validate_operation(done, "coordinates")["summary"] == ""
+
+
+@pytest.mark.parametrize(
+    "operation, grounding",
+    [
+        ({"operation": "click", "text": "OK"}, "coordinates"),
+        ({"operation": "click", "x": "0.1", "y": "0.2"}, "ocr"),
+        ({"operation": "drag", "label": "~1"}, "som"),
+        ({"operation": "write"}, "coordinates"),
+        ({"operation": "jump"}, "coordinates"),
+        ("click", "coordinates"),
+    ],
+)
+def test_invalid_operations(operation, grounding):
+    with pytest.raises(ResponseParseError):
+        validate_operation(operation, grounding)
+
+
+def test_invalid_response_type():
+    with pytest.raises(ResponseParseError):
+        validate_operations("click", "coordinates")
+
+
+@pytest.mark.parametrize("grounding", ["coordinates", "ocr", "som"])
+def test_schema_is_strict(grounding):
+    schema = response_schema(grounding)
+    assert schema["required"] == ["operations"]
+    for item in operations_schema(grounding)["items"]["anyOf"]:
+        # strict structured outputs want every property listed as required
+        assert set(item["required"]) == set(item["properties"])
+        assert item["additionalProperties"] is False
+
+
+def test_parse_stats():
+    stats = ParseStats()
+    stats.record("gpt-4", "valid")
+    stats.record("gpt-4", "valid")
+    stats.record("gpt-4", "repaired")
+    assert stats.summary() == {"gpt-4": {"valid": 2, "repaired": 1}}
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from operate.exceptions import ResponseParseError
+from operate.utils.stream import OperationStreamParser
+
+PRESS = {"thought": "New tab", "operation": "press", "keys": ["ctrl", "t"]}
+WRITE = {"thought": "Search", "operation": "write", "content": "a [b] {c}"}
+
+
+def feed_chunks(parser, text, size):
+    operations = []
+    for start in range(0, len(text), size):
+        operations.extend(parser.feed(text[start : start + size]))
+    return operations
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_array_operations_complete_as_they_close(size):
+    text = json.dumps([PRESS, WRITE])
+    parser = OperationStreamParser()
+    assert feed_chunks(parser, text, size) == [PRESS, WRITE]
+    assert parser.done
+    assert json.loads(parser.array_text) == [PRESS, WRITE]
+
+
+def test_first_operation_before_the_array_closes():
+    text = json.dumps([PRESS, WRITE])
+    cut = text.index("}") + 1
+    parser = OperationStreamParser()
+    assert parser.feed(text[:cut]) == [PRESS]
+    assert not parser.done
+    assert parser.feed(text[cut:]) == [WRITE]
+
+
+def test_fenced_array_with_prose():
+    text = 'Here is the plan, "quoted":\n```json\n' + json.dumps([PRESS]) + "\n```"
+    parser = OperationStreamParser()
+    assert parser.feed(text) == [PRESS]
+    assert parser.done
+
+
+def test_operations_wrapper():
+    text = json.dumps({"operations": [PRESS, WRITE]})
+    parser = OperationStreamParser()
+    assert feed_chunks(parser, text, 2) == [PRESS, WRITE]
+    assert parser.done
+
+
+def test_operations_wrapper_after_other_keys():
+    text = json.dumps({"notes": ["x", "operations"], "operations": [WRITE]})
+    parser = OperationStreamParser()
+    assert parser.feed(text) == [WRITE]
+
+
+@pytest.mark.parametrize("size", [1, 1000])
+def test_single_object_is_not_an_array(size):
+    text = json.dumps(PRESS) + "\n[trailing]"
+    parser = OperationStreamParser()
+    assert feed_chunks(parser, text, size) == []
+    assert not parser.started
+    assert parser.ended
+
+
+def test_repaired_operation():
+    parser = OperationStreamParser()
+    operations = parser.feed("[{'operation': 'press', 'keys': ['enter'],}]")
+    assert operations == [{"operation": "press", "keys": ["enter"]}]
+    assert parser.repaired == 1
+
+
+def test_undecodable_operation():
+    parser = OperationStreamParser()
+    with pytest.raises(ResponseParseError):
+        parser.feed('[{"operation": "press", "keys": [enter}]')
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from operate.utils.screenshot import Frame
+from operate.utils.tiles import (
+    TileCache,
+    config,
+    dirty_regions,
+    merge_rects,
+    tile_hashes,
+)
+
+
+@pytest.fixture(autouse=True)
+def tile_settings(monkeypatch):
+    monkeypatch.setattr(config, "grounding_tile_size", 32)
+    monkeypatch.setattr(config, "grounding_max_dirty", 0.5)
+
+
+def screen(boxes):
+    image = Image.new("RGB", (512, 256), "white")
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill="black")
+    return Frame(image)
+
+
+def find_boxes(frame):
+    """A stand-in detector: the bounding box of the black pixels, per crop."""
+    ys, xs = np.nonzero(frame.array[:, :, 0] < 128)
+    if not len(xs):
+        return []
+    return [(int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)]
+
+
+def bounds(box):
+    return box
+
+
+def shift(box, dx, dy):
+    return (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy)
+
+
+def test_tile_hashes():
+    array = np.zeros((70, 100, 3), dtype=np.uint8)
+    hashes = tile_hashes(array, 32)
+    assert hashes.shape == (3, 4)
+    array[40, 40] = 255
+    changed = tile_hashes(array, 32) != hashes
+    assert changed.sum() == 1 and changed[1, 1]
+
+
+def test_merge_rects():
+    assert merge_rects([(0, 0, 10, 10), (5, 5, 20, 20), (30, 30, 40, 40)]) == [
+        (0, 0, 20, 20),
+        (30, 30, 40, 40),
+    ]
+
+
+def test_dirty_regions_are_grown_and_clipped():
+    dirty = np.zeros((8, 16), dtype=bool)
+    dirty[0, 0] = True
+    ((x1, y1, x2, y2),) = dirty_regions(dirty, 32, (512, 256))
+    assert (x1, y1) == (0, 0)
+    assert x2 - x1 >= 128 and y2 - y1 >= 128
+
+
+def test_reuse_partial_and_full():
+    cache = TileCache("test")
+    first = screen([(20, 20, 40, 40)])
+    assert cache.analyze(first, find_boxes, bounds, shift) == [(20, 20, 41, 41)]
+    assert cache.stats["full"] == 1
+
+    assert cache.analyze(screen([(20, 20, 40, 40)]), find_boxes, bounds, shift) == [
+        (20, 20, 41, 41)
+    ]
+    assert cache.stats["reused"] == 1
+
+    # a change far away only reanalyzes its region, the old box is kept
+    moved = screen([(20, 20, 40, 40), (400, 200, 420, 220)])
+    boxes = cache.analyze(moved, find_boxes, bounds, shift)
+    assert sorted(boxes) == [(20, 20, 41, 41), (400, 200, 421, 221)]
+    assert cache.stats["partial"] == 1
+    assert cache.stats["analyzed_pixels"] < 2 * 512 * 256
+
+    inverted = Frame(Image.new("RGB", (512, 256), "black"))
+    assert cache.analyze(inverted, find_boxes, bounds, shift) == [(0, 0, 512, 256)]
+    assert cache.stats["full"] == 2
+
+
+def test_keys_are_separate():
+    cache = TileCache("test-keys")
+    frame = screen([(20, 20, 40, 40)])
+    cache.analyze(frame, find_boxes, bounds, shift, key="en")
+    cache.analyze(frame, find_boxes, bounds, shift, key="de")
+    assert cache.stats["full"] == 2